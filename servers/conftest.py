@@ -5,6 +5,7 @@ This file is automatically discovered by pytest when running tests from the serv
 It provides common configuration and utilities for all server test suites.
 """
 
+import importlib.util
 import sys
 import os
 import warnings
@@ -18,6 +19,10 @@ servers_dir = os.path.dirname(os.path.abspath(__file__))
 if servers_dir not in sys.path:
     sys.path.insert(0, servers_dir)
 
+# Probe optional dependencies once; find_spec locates without importing
+HAS_CHROMADB = importlib.util.find_spec("chromadb") is not None
+HAS_OPENAI = importlib.util.find_spec("openai") is not None
+
 
 def pytest_configure(config):
     """Configure pytest with custom markers."""
@@ -43,25 +48,12 @@ def pytest_configure(config):
 
 def pytest_collection_modifyitems(config, items):
     """Automatically skip tests that require unavailable dependencies."""
-    # Check for optional dependencies
-    try:
-        import chromadb
-        has_chromadb = True
-    except ImportError:
-        has_chromadb = False
-
-    try:
-        import openai
-        has_openai = True
-    except ImportError:
-        has_openai = False
-
     skip_chromadb = None
     skip_openai = None
 
-    if not has_chromadb:
+    if not HAS_CHROMADB:
         skip_chromadb = "ChromaDB not installed (pip install chromadb)"
-    if not has_openai:
+    if not HAS_OPENAI:
         skip_openai = "OpenAI not installed (pip install openai)"
 
     # Apply skips
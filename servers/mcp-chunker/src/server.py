@@ -4,10 +4,13 @@ MCP Chunker Server
 Document chunking and preprocessing for RAG pipelines.
 """
 
+import hashlib
 import json
 import logging
 import re
-from typing import Any, Optional, List, Dict
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Iterable, Optional, Iterator, List, Dict, Tuple
 
 try:
     from mcp.server import Server
@@ -17,121 +20,210 @@ except ImportError:
     Server = None
     stdio_server = None
 
+from .utils import fixed_chunk_ranges
+
+try:
+    import msgspec
+    _json_encode = msgspec.json.encode
+except ImportError:
+    msgspec = None
+
+    def _json_encode(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+_PARA_RE = re.compile(r'\n\s*\n')
+
 
 class ChunkerManager:
-    """Manages document chunking operations."""
+    """Manages document chunking operations.
+
+    Chunk sizes and offsets are measured in code points on the original str.
+    CPython already stores ASCII text at one byte per character, so slicing
+    it costs the same as slicing the equivalent bytes.
+    """
     
-    def __init__(self, default_chunk_size: int = 512, default_overlap: int = 50):
+    def __init__(self, default_chunk_size: int = 512, default_overlap: int = 50,
+                 preview_cache_size: int = 128):
         self.chunk_size = default_chunk_size
         self.overlap = default_overlap
+        self.preview_cache_size = preview_cache_size
+        self._preview_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # Reused accumulator for _merge_segments; MCP stdio serves one call at a time
+        self._scratch: List[str] = []
     
-    def _split_fixed(self, text: str, chunk_size: int, overlap: int) -> List[str]:
+    def _split_fixed(self, text: str, chunk_size: int, overlap: int) -> Iterator[str]:
         """Split text into fixed-size chunks."""
-        chunks = []
-        start = 0
-        while start < len(text):
-            end = start + chunk_size
-            chunk = text[start:end]
-            if chunk.strip():
-                chunks.append(chunk.strip())
-            start = end - overlap
-        return chunks
+        # Build the whole (start, end) slice table up front
+        starts, ends = fixed_chunk_ranges(len(text), chunk_size, overlap)
+        
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            chunk = text[start:end].strip()
+            if chunk:
+                yield chunk
     
-    def _split_recursive(self, text: str, chunk_size: int, 
-                        separators: List[str] = None) -> List[str]:
-        """Split text recursively by separators."""
-        if separators is None:
-            separators = ["\n\n", "\n", ". ", " ", ""]
+    def _split_segments(self, text: str, chunk_size: int,
+                        separators: List[str]) -> List[Tuple[str, str]]:
+        """Split text down the separator cascade until every segment fits.
+
+        Returns (joiner, segment) pairs, where joiner is the separator that
+        preceded the segment in the original text.
+        """
+        if len(text) <= chunk_size:
+            return [("", text)]
         
-        chunks = []
+        for i, sep in enumerate(separators):
+            if not sep:
+                break
+            parts = text.split(sep)
+            if len(parts) == 1:
+                continue
+            
+            segments: List[Tuple[str, str]] = []
+            for j, part in enumerate(parts):
+                joiner = sep if j else ""
+                if len(part) <= chunk_size:
+                    segments.append((joiner, part))
+                    continue
+                sub = self._split_segments(part, chunk_size, separators[i + 1:])
+                segments.append((joiner, sub[0][1]))
+                segments.extend(sub[1:])
+            return segments
         
-        if len(text) <= chunk_size:
-            return [text] if text.strip() else []
+        # No separator left: cut at character boundaries
+        return [("", text[k:k + chunk_size]) for k in range(0, len(text), chunk_size)]
+    
+    def _merge_segments(self, segments: List[Tuple[str, str]],
+                        chunk_size: int) -> Iterator[str]:
+        """Greedily merge adjacent segments while the result fits chunk_size."""
+        cur_parts = self._scratch
+        cur_parts.clear()
+        cur_len = 0
         
-        for sep in separators:
-            if sep in text:
-                parts = text.split(sep)
-                current_chunk = ""
-                
-                for part in parts:
-                    if len(current_chunk) + len(part) + len(sep) <= chunk_size:
-                        current_chunk += (sep if current_chunk else "") + part
-                    else:
-                        if current_chunk.strip():
-                            chunks.append(current_chunk.strip())
-                        current_chunk = part
-                
-                if current_chunk.strip():
-                    chunks.append(current_chunk.strip())
-                
-                return chunks
+        # The first segment always carries an empty joiner, so joiners can be
+        # appended unconditionally; only a flush starts a chunk without one.
+        for joiner, segment in segments:
+            add_len = len(joiner) + len(segment)
+            if cur_len + add_len > chunk_size:
+                current_chunk = "".join(cur_parts).strip()
+                if current_chunk:
+                    yield current_chunk
+                cur_parts.clear()
+                cur_parts.append(segment)
+                cur_len = len(segment)
+            else:
+                cur_parts.append(joiner)
+                cur_parts.append(segment)
+                cur_len += add_len
         
-        # Fallback to fixed splitting
-        return self._split_fixed(text, chunk_size, self.overlap)
+        current_chunk = "".join(cur_parts).strip()
+        cur_parts.clear()
+        if current_chunk:
+            yield current_chunk
     
-    def _split_sentence(self, text: str, chunk_size: int) -> List[str]:
-        """Split text by sentences, grouping to target size."""
-        # Simple sentence splitting
-        sentences = re.split(r'(?<=[.!?])\s+', text)
+    def _split_recursive(self, text: str, chunk_size: int, 
+                        separators: List[str] = None) -> Iterator[str]:
+        """Split text recursively by separators, then merge adjacent pieces."""
+        if separators is None:
+            separators = ["\n\n", "\n", ". ", " ", ""]
         
-        chunks = []
-        current_chunk = ""
+        # Blank input needs no splitting; isspace() checks without copying
+        if not text or text.isspace():
+            return iter(())
         
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= chunk_size:
-                current_chunk += (" " if current_chunk else "") + sentence
-            else:
-                if current_chunk.strip():
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence
+        segments = self._split_segments(text, chunk_size, separators)
+        return self._merge_segments(segments, chunk_size)
+    
+    def _split_sentence(self, text: str, chunk_size: int) -> Iterator[str]:
+        """Split text by sentences, grouping to target size."""
+        # Track sentence boundaries as offsets and slice the original text
+        # only when a chunk is flushed, so no per-sentence strings are built.
+        boundaries = chain(
+            ((m.start(), m.end()) for m in _SENTENCE_RE.finditer(text)),
+            [(len(text), len(text))]
+        )
+        chunk_start = 0
+        chunk_end = -1
+        sent_start = 0
         
-        if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+        for sent_end, next_start in boundaries:
+            if chunk_end >= 0 and sent_end - chunk_start > chunk_size:
+                current_chunk = text[chunk_start:chunk_end].strip()
+                if current_chunk:
+                    yield current_chunk
+                chunk_start = sent_start
+            chunk_end = sent_end
+            sent_start = next_start
         
-        return chunks
+        current_chunk = text[chunk_start:].strip()
+        if current_chunk:
+            yield current_chunk
     
     def _split_paragraph(self, text: str) -> List[str]:
         """Split text by paragraphs."""
-        paragraphs = text.split("\n\n")
-        return [p.strip() for p in paragraphs if p.strip()]
+        # Runs of blank (or whitespace-only) lines count as one break
+        return [p for p in map(str.strip, _PARA_RE.split(text)) if p]
     
-    def chunk_text(self, text: str, strategy: str = "recursive",
-                  chunk_size: Optional[int] = None, 
-                  overlap: Optional[int] = None) -> dict:
-        """Split text using specified strategy."""
+    # Strategy name -> splitter; unknown strategies fall back to "recursive"
+    _STRATEGIES = {
+        "fixed": lambda self, text, size, overlap: self._split_fixed(text, size, overlap),
+        "recursive": lambda self, text, size, overlap: self._split_recursive(text, size),
+        "sentence": lambda self, text, size, overlap: self._split_sentence(text, size),
+        "paragraph": lambda self, text, size, overlap: self._split_paragraph(text),
+    }
+    
+    def _chunk_with_stats(self, text: str, strategy: str,
+                          chunk_size: Optional[int] = None,
+                          overlap: Optional[int] = None) -> Tuple[dict, int, int]:
+        """Split text and return the result with its min/max chunk sizes."""
         chunk_size = chunk_size or self.chunk_size
         overlap = overlap or self.overlap
         
-        if strategy == "fixed":
-            chunks = self._split_fixed(text, chunk_size, overlap)
-        elif strategy == "recursive":
-            chunks = self._split_recursive(text, chunk_size)
-        elif strategy == "sentence":
-            chunks = self._split_sentence(text, chunk_size)
-        elif strategy == "paragraph":
-            chunks = self._split_paragraph(text)
-        else:
-            chunks = self._split_recursive(text, chunk_size)
+        split = self._STRATEGIES.get(strategy, self._STRATEGIES["recursive"])
+        chunks = split(self, text, chunk_size, overlap)
+        return self._collect_chunks(chunks, strategy, chunk_size, overlap)
+    
+    @staticmethod
+    def _collect_chunks(chunks: Iterable[str], strategy: str, chunk_size: int,
+                        overlap: int) -> Tuple[dict, int, int]:
+        """Build the chunk result from chunk strings, with min/max chunk sizes."""
+        # Consume the splitter lazily, tallying sizes in the same pass
+        chunk_dicts = []
+        total_chars = 0
+        min_chars = 0
+        max_chars = 0
+        for i, chunk in enumerate(chunks):
+            char_count = len(chunk)
+            chunk_dicts.append({
+                "index": i,
+                "text": chunk,
+                "char_count": char_count
+            })
+            total_chars += char_count
+            if not i or char_count < min_chars:
+                min_chars = char_count
+            if char_count > max_chars:
+                max_chars = char_count
         
-        return {
+        result = {
             "status": "success",
             "strategy": strategy,
             "chunk_size": chunk_size,
             "overlap": overlap,
-            "chunks": [
-                {
-                    "index": i,
-                    "text": chunk,
-                    "char_count": len(chunk)
-                }
-                for i, chunk in enumerate(chunks)
-            ],
-            "total_chunks": len(chunks),
-            "total_chars": sum(len(c) for c in chunks)
+            "chunks": chunk_dicts,
+            "total_chunks": len(chunk_dicts),
+            "total_chars": total_chars
         }
+        return result, min_chars, max_chars
+    
+    def chunk_text(self, text: str, strategy: str = "recursive",
+                  chunk_size: Optional[int] = None, 
+                  overlap: Optional[int] = None) -> dict:
+        """Split text using specified strategy."""
+        return self._chunk_with_stats(text, strategy, chunk_size, overlap)[0]
     
     def chunk_document(self, document: Dict, strategy: str = "recursive") -> dict:
         """Process entire document with metadata."""
@@ -176,15 +268,35 @@ class ChunkerManager:
     
     def preview_chunks(self, text: str, strategy: str = "recursive") -> dict:
         """Preview chunking without saving."""
-        result = self.chunk_text(text, strategy)
+        # Key on a digest of the text plus the settings that shape the output,
+        # so set_chunk_size / set_overlap naturally miss the old entries.
+        key = (
+            hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest(),
+            strategy,
+            self.chunk_size,
+            self.overlap,
+        )
+        cached = self._preview_cache.get(key)
+        if cached is not None:
+            self._preview_cache.move_to_end(key)
+            # Rebuild fresh dicts from the stored strings; cheaper than a deep copy
+            result, min_chars, max_chars = self._collect_chunks(
+                cached, strategy, self.chunk_size, self.overlap
+            )
+        else:
+            result, min_chars, max_chars = self._chunk_with_stats(text, strategy)
+            if self.preview_cache_size > 0:
+                self._preview_cache[key] = tuple(chunk["text"] for chunk in result["chunks"])
+                if len(self._preview_cache) > self.preview_cache_size:
+                    self._preview_cache.popitem(last=False)
         
         # Add preview info
         result["preview"] = True
         result["summary"] = {
             "total_chunks": result["total_chunks"],
             "avg_chunk_size": result["total_chars"] // max(result["total_chunks"], 1),
-            "min_chunk_size": min(c["char_count"] for c in result["chunks"]) if result["chunks"] else 0,
-            "max_chunk_size": max(c["char_count"] for c in result["chunks"]) if result["chunks"] else 0
+            "min_chunk_size": min_chars,
+            "max_chunk_size": max_chars
         }
         
         return result
@@ -284,7 +396,7 @@ if app:
             else:
                 result = {"error": f"Unknown tool: {name}"}
             
-            return [TextContent(type="text", text=json.dumps(result, indent=2))]
+            return [TextContent(type="text", text=_json_encode(result).decode("utf-8"))]
         except Exception as e:
             logger.error(f"Error in {name}: {e}")
             return [TextContent(type="text", text=json.dumps({"error": str(e)}))]
@@ -6,8 +6,13 @@ import re
 import logging
 from typing import List, Tuple
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
+_WS_RE = re.compile(r'\s+')
+_SENT_END_RE = re.compile(r'[.!?]+\s+')
+
 
 def clean_text(text: str) -> str:
     """Clean and normalize text.
@@ -19,7 +24,7 @@ def clean_text(text: str) -> str:
         Cleaned text
     """
     # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = _WS_RE.sub(' ', text)
 
     # Remove leading/trailing whitespace
     text = text.strip()
@@ -46,11 +51,24 @@ def split_by_separator(text: str, separator: str, keep_separator: bool = False)
             chunk = parts[i]
             if i + 1 < len(parts):
                 chunk += parts[i + 1]
-            if chunk.strip():
-                chunks.append(chunk.strip())
+            chunk = chunk.strip()
+            if chunk:
+                chunks.append(chunk)
         return chunks
     else:
-        return [p.strip() for p in text.split(separator) if p.strip()]
+        return [p for p in (part.strip() for part in text.split(separator)) if p]
+
+
+def _effective_overlap(chunk_size: int, overlap: int) -> int:
+    """Validate chunk_size and cap an overlap that would stall the chunker."""
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    if overlap >= chunk_size:
+        logger.warning(f"Overlap ({overlap}) >= chunk_size ({chunk_size}), reducing overlap")
+        overlap = chunk_size // 2
+
+    return overlap
 
 
 def calculate_overlap_indices(total_length: int, chunk_size: int, overlap: int) -> List[Tuple[int, int]]:
@@ -64,26 +82,42 @@ def calculate_overlap_indices(total_length: int, chunk_size: int, overlap: int)
     Returns:
         List of (start, end) tuples
     """
-    if chunk_size <= 0:
-        raise ValueError("chunk_size must be positive")
+    overlap = _effective_overlap(chunk_size, overlap)
+
+    if total_length <= 0:
+        return []
+
+    # Closed form: chunks advance by step and stop once one reaches the end
+    # of the text (or, with a negative overlap, once a start passes it).
+    step = chunk_size - overlap
+    num_chunks = min(
+        -(-total_length // step),
+        1 + max(0, -(-(total_length - chunk_size) // step)),
+    )
+    starts = np.arange(num_chunks, dtype=np.int64) * step
+    ends = np.minimum(starts + chunk_size, total_length)
+
+    return list(zip(starts.tolist(), ends.tolist()))
 
-    if overlap >= chunk_size:
-        logger.warning(f"Overlap ({overlap}) >= chunk_size ({chunk_size}), reducing overlap")
-        overlap = chunk_size // 2
 
-    indices = []
-    start = 0
+def fixed_chunk_ranges(total_length: int, chunk_size: int,
+                       overlap: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute start and end offsets for fixed-size overlapping chunks.
 
-    while start < total_length:
-        end = min(start + chunk_size, total_length)
-        indices.append((start, end))
+    Args:
+        total_length: Total length of text
+        chunk_size: Size of each chunk
+        overlap: Overlap between chunks
 
-        if end >= total_length:
-            break
+    Returns:
+        Tuple of (starts, ends) integer arrays
+    """
+    overlap = _effective_overlap(chunk_size, overlap)
 
-        start = end - overlap
+    starts = np.arange(0, total_length, chunk_size - overlap, dtype=np.int64)
+    ends = np.minimum(starts + chunk_size, total_length)
 
-    return indices
+    return starts, ends
 
 
 def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
@@ -109,10 +143,9 @@ def find_sentence_boundaries(text: str) -> List[int]:
         List of character positions where sentences end
     """
     # Simple sentence boundary detection
-    sentence_endings = r'[.!?]+[\s]+'
     boundaries = [0]
 
-    for match in re.finditer(sentence_endings, text):
+    for match in _SENT_END_RE.finditer(text):
         boundaries.append(match.end())
 
     if boundaries[-1] < len(text):
@@ -143,3 +143,126 @@ def test_chunk_overlap(chunker):
     # Chunks should overlap
     assert result["total_chunks"] > 1
     # First chunk should have some overlap with second
+
+
+def test_recursive_chunks_respect_size(chunker):
+    """Test recursive chunks never exceed chunk_size when words fit."""
+    text = "word " * 500
+
+    result = chunker.chunk_text(text, strategy="recursive", chunk_size=64)
+
+    assert result["total_chunks"] > 1
+    assert all(c["char_count"] <= 64 for c in result["chunks"])
+    assert " ".join(c["text"] for c in result["chunks"]).split() == text.split()
+
+
+def test_chunk_fixed_overlap_not_smaller_than_size(chunker):
+    """Test fixed chunking terminates when overlap >= chunk_size."""
+    text = "abcdefghij" * 20
+
+    result = chunker.chunk_text(text, strategy="fixed", chunk_size=20, overlap=40)
+
+    assert result["total_chunks"] > 0
+    assert all(c["char_count"] <= 20 for c in result["chunks"])
+
+
+def test_chunk_paragraph_collapses_blank_runs(chunker):
+    """Test runs of blank lines produce a single paragraph break."""
+    text = "First paragraph.\n\n\n\nSecond paragraph.\n  \n\nThird paragraph."
+
+    result = chunker.chunk_text(text, strategy="paragraph")
+
+    assert [c["text"] for c in result["chunks"]] == [
+        "First paragraph.", "Second paragraph.", "Third paragraph."
+    ]
+
+
+def test_recursive_resplits_oversized_parts(chunker):
+    """Test oversized paragraphs are split further instead of kept whole."""
+    text = "short intro.\n\n" + "long sentence here. " * 40 + "\n\n" + "x" * 150
+
+    result = chunker.chunk_text(text, strategy="recursive", chunk_size=100)
+
+    assert all(c["char_count"] <= 100 for c in result["chunks"])
+    assert "".join(c["text"] for c in result["chunks"]).count("x") == 150
+
+
+def test_preview_chunks_cached(chunker):
+    """Test repeated previews reuse the cached result until settings change."""
+    text = "This is a test. " * 20
+
+    first = chunker.preview_chunks(text, strategy="sentence")
+    second = chunker.preview_chunks(text, strategy="sentence")
+
+    assert second == first
+    assert second["chunks"] is not first["chunks"]
+
+    chunker.set_chunk_size(32)
+    third = chunker.preview_chunks(text, strategy="sentence")
+
+    assert third["total_chunks"] > first["total_chunks"]
+
+
+def test_preview_chunks_cache_isolated_from_callers(chunker):
+    """Test that mutating a returned preview does not corrupt later cache hits."""
+    text = "This is a test. " * 20
+
+    first = chunker.preview_chunks(text, strategy="sentence")
+    first["chunks"].append({"index": 99, "text": "junk", "char_count": 4})
+    first["summary"]["total_chunks"] = -1
+
+    second = chunker.preview_chunks(text, strategy="sentence")
+
+    assert second["summary"]["total_chunks"] == len(second["chunks"]) == second["total_chunks"]
+
+
+def test_chunk_sentence_groups_whole_sentences(chunker):
+    """Test sentence chunks keep sentences intact and respect chunk_size."""
+    text = "First sentence. Second sentence. Third sentence. Fourth sentence."
+
+    result = chunker.chunk_text(text, strategy="sentence", chunk_size=35)
+
+    assert [c["text"] for c in result["chunks"]] == [
+        "First sentence. Second sentence.",
+        "Third sentence. Fourth sentence.",
+    ]
+
+
+def test_preview_chunks_summary(chunker):
+    """Test preview summary sizes match the produced chunks."""
+    text = "Short one. " + "A much longer sentence follows here. " * 3
+
+    result = chunker.preview_chunks(text, strategy="sentence")
+    sizes = [c["char_count"] for c in result["chunks"]]
+
+    assert result["summary"]["min_chunk_size"] == min(sizes)
+    assert result["summary"]["max_chunk_size"] == max(sizes)
+    assert result["summary"]["avg_chunk_size"] == sum(sizes) // len(sizes)
+
+
+def test_recursive_many_separators(chunker):
+    """Test text with thousands of separators is merged back to full chunks."""
+    text = "a\n" * 5000
+
+    result = chunker.chunk_text(text, strategy="recursive", chunk_size=100)
+
+    assert result["total_chunks"] == 100
+    assert all(c["char_count"] == 99 for c in result["chunks"])
+
+
+def test_whitespace_only_text(chunker):
+    """Test whitespace-only text yields no chunks for any strategy."""
+    for strategy in ["fixed", "recursive", "sentence", "paragraph"]:
+        result = chunker.chunk_text(" \n\n\t ", strategy=strategy)
+
+        assert result["total_chunks"] == 0
+
+
+@pytest.mark.parametrize("strategy", ["fixed", "recursive", "sentence", "paragraph"])
+def test_total_chars_matches_chunks(chunker, strategy):
+    """Test total_chars equals the sum of the chunk sizes."""
+    text = "Some sentence here.\n\nAnother one follows! " * 30
+
+    result = chunker.chunk_text(text, strategy=strategy, chunk_size=100, overlap=10)
+
+    assert result["total_chars"] == sum(c["char_count"] for c in result["chunks"])
@@ -4,11 +4,18 @@ MCP DataSources Server
 Load documents from various sources (files, URLs, APIs, databases).
 """
 
+import fnmatch
+import itertools
 import json
 import logging
 import os
+import re
+import stat
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Optional, List, Dict
+from typing import Any, Optional, Iterator, List, Dict, Tuple
 
 try:
     from mcp.server import Server
@@ -18,6 +25,21 @@ except ImportError:
     Server = None
     stdio_server = None
 
+try:
+    import orjson
+
+    def _json_dumps(obj: Any, pretty: bool = True) -> str:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(obj, option=option).decode("utf-8")
+except ImportError:
+    orjson = None
+
+    def _json_dumps(obj: Any, pretty: bool = True) -> str:
+        # Match orjson's output: compact separators and raw UTF-8
+        if pretty:
+            return json.dumps(obj, indent=2, ensure_ascii=False)
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -36,43 +58,107 @@ class DataSourcesManager:
         ".csv": "csv"
     }
     
-    def __init__(self):
+    def __init__(self, parse_cache_size: int = 1024, validate_json: bool = False):
         self.sources = {}
-        self.source_counter = 0
+        self._source_ids = itertools.count(1)
+        self.validate_json = validate_json
+        self.parse_cache_size = parse_cache_size
+        self._parse_cache: "OrderedDict[tuple, Dict]" = OrderedDict()
+        # load_files parses on worker threads, so guard the LRU bookkeeping
+        self._parse_cache_lock = threading.Lock()
     
-    def _read_text_file(self, path: str) -> str:
-        """Read plain text file."""
-        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
+    def _read_text_file(self, path: str) -> Tuple[str, int]:
+        """Read plain text file, returning its text and size in bytes."""
+        # One bulk read and decode instead of TextIOWrapper's chunked decoding
+        with open(path, 'rb') as f:
+            data = f.read()
+        content = data.decode('utf-8', errors='ignore')
+        if "\r" in content:
+            # Keep the universal-newline behaviour of text-mode reads
+            content = content.replace("\r\n", "\n").replace("\r", "\n")
+        return content, len(data)
+    
+    def _read_json_file(self, path: str) -> Tuple[str, int]:
+        """Read JSON file as text, optionally checking that it parses."""
+        # Keep the file text as-is; parsing only to re-serialize it
+        # doubled the work for content that is chunked as plain text
+        content, size = self._read_text_file(path)
+        if self.validate_json:
+            json.loads(content)
+        return content, size
+    
+    # File type -> reader returning (content, size in bytes)
+    _READERS = {
+        "text": _read_text_file,
+        "markdown": _read_text_file,
+        "csv": _read_text_file,
+        "json": _read_json_file,
+    }
+    
+    def _parse_file(self, path: str, stat_result: Optional[os.stat_result] = None) -> Dict:
+        """Parse file, reusing the cached result while the file is unchanged.
+
+        Pass stat_result when the caller already has it (e.g. from a
+        DirEntry) to skip another stat call.
+        """
+        try:
+            st = stat_result if stat_result is not None else os.stat(path)
+        except OSError as e:
+            return {
+                "status": "error",
+                "path": path,
+                "error": str(e)
+            }
+        
+        key = (path, st.st_mtime_ns, st.st_size)
+        with self._parse_cache_lock:
+            cached = self._parse_cache.get(key)
+            if cached is not None:
+                self._parse_cache.move_to_end(key)
+                return self._copy_doc(cached)
+        
+        doc = self._parse_file_contents(path, st)
+        if doc["status"] == "success" and self.parse_cache_size > 0:
+            with self._parse_cache_lock:
+                self._parse_cache[key] = doc
+                if len(self._parse_cache) > self.parse_cache_size:
+                    self._parse_cache.popitem(last=False)
+            return self._copy_doc(doc)
+        return doc
+
+    @staticmethod
+    def _copy_doc(doc: Dict) -> Dict:
+        """Copy a cached document, including its nested metadata dict."""
+        return {**doc, "metadata": dict(doc["metadata"])}
     
-    def _parse_file(self, path: str) -> Dict:
+    def _parse_file_contents(self, path: str, st: os.stat_result) -> Dict:
         """Parse file based on extension."""
-        ext = Path(path).suffix.lower()
+        path_obj = Path(path)
+        ext = path_obj.suffix.lower()
+        name = path_obj.name
         file_type = self.SUPPORTED_EXTENSIONS.get(ext, "unknown")
         
         try:
-            if file_type in ["text", "markdown"]:
-                content = self._read_text_file(path)
-            elif file_type == "json":
-                with open(path, 'r') as f:
-                    data = json.load(f)
-                content = json.dumps(data, indent=2)
-            elif file_type == "csv":
-                content = self._read_text_file(path)
+            reader = self._READERS.get(file_type)
+            if reader is not None:
+                content, size = reader(self, path)
             else:
                 # For PDF, DOCX, HTML - mock content
-                content = f"[Content from {Path(path).name} - requires additional parser]"
+                content = f"[Content from {name} - requires additional parser]"
+                size = st.st_size
             
             return {
                 "status": "success",
                 "path": path,
                 "type": file_type,
                 "content": content,
-                "size": len(content),
+                "size": size,
+                "char_count": len(content),
                 "metadata": {
-                    "filename": Path(path).name,
+                    "filename": name,
                     "extension": ext,
-                    "source": path
+                    "source": path,
+                    "modified": st.st_mtime
                 }
             }
         except Exception as e:
@@ -82,25 +168,80 @@ class DataSourcesManager:
                 "error": str(e)
             }
     
+    def _iter_files(self, root: str, pattern: str,
+                    recursive: bool) -> Iterator[Tuple[str, Optional[os.DirEntry]]]:
+        """Yield (path, entry) for supported files under root matching pattern.
+
+        entry is the scandir DirEntry, or None for the pathlib glob fallback.
+        """
+        supported = self.SUPPORTED_EXTENSIONS
+        
+        if "/" in pattern or os.sep in pattern:
+            # Multi-component patterns need pathlib's glob semantics
+            root_obj = Path(root)
+            glob_method = root_obj.rglob if recursive else root_obj.glob
+            for file_path in glob_method(pattern):
+                if file_path.suffix.lower() in supported and file_path.is_file():
+                    yield str(file_path), None
+            return
+        
+        # Compile the name pattern once rather than per entry; "*" matches all
+        match_name = None
+        if pattern != "*":
+            match_name = re.compile(fnmatch.translate(os.path.normcase(pattern))).match
+        
+        # DirEntry caches its type from the directory read, so no extra stats
+        stack = [root]
+        while stack:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                        continue
+                    name = entry.name
+                    dot = name.rfind(".")
+                    if dot < 0 or name[dot:].lower() not in supported:
+                        continue
+                    if match_name is not None and not match_name(os.path.normcase(name)):
+                        continue
+                    if entry.is_file():
+                        yield entry.path, entry
+    
     def load_files(self, path: str, pattern: str = "*", 
                   recursive: bool = False) -> dict:
         """Load documents from filesystem."""
         path_obj = Path(path)
         documents = []
         
-        if path_obj.is_file():
+        try:
+            path_stat = path_obj.stat()
+        except OSError:
+            path_stat = None
+        
+        if path_stat is not None and stat.S_ISREG(path_stat.st_mode):
             # Single file
-            doc = self._parse_file(str(path_obj))
+            doc = self._parse_file(str(path_obj), path_stat)
             if doc["status"] == "success":
                 documents.append(doc)
-        elif path_obj.is_dir():
+        elif path_stat is not None and stat.S_ISDIR(path_stat.st_mode):
             # Directory
-            glob_method = path_obj.rglob if recursive else path_obj.glob
-            for file_path in glob_method(pattern):
-                if file_path.is_file():
-                    ext = file_path.suffix.lower()
-                    if ext in self.SUPPORTED_EXTENSIONS:
-                        doc = self._parse_file(str(file_path))
+            files = list(self._iter_files(str(path_obj), pattern, recursive))
+            
+            def parse(item):
+                file_path, entry = item
+                # DirEntry.stat() is cached on the entry (and free on Windows)
+                try:
+                    file_stat = entry.stat() if entry is not None else None
+                except OSError:
+                    file_stat = None
+                return self._parse_file(file_path, file_stat)
+            
+            # Parsing is I/O-bound, so threads overlap the reads; map keeps order
+            if files:
+                max_workers = min(32, (os.cpu_count() or 1) + 4, len(files))
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    for doc in executor.map(parse, files):
                         if doc["status"] == "success":
                             documents.append(doc)
         else:
@@ -110,14 +251,12 @@ class DataSourcesManager:
             }
         
         # Register source
-        self.source_counter += 1
-        source_id = f"files_{self.source_counter}"
-        self.sources[source_id] = {
+        source_id = self._register_source("files", {
             "type": "files",
             "path": path,
             "pattern": pattern,
             "document_count": len(documents)
-        }
+        })
         
         return {
             "status": "success",
@@ -134,12 +273,10 @@ class DataSourcesManager:
         # Mock URL loading
         content = f"[Content from {url} - requires HTTP client]"
         
-        self.source_counter += 1
-        source_id = f"url_{self.source_counter}"
-        self.sources[source_id] = {
+        source_id = self._register_source("url", {
             "type": "url",
             "url": url
-        }
+        })
         
         return {
             "status": "success",
@@ -165,13 +302,11 @@ class DataSourcesManager:
             "method": method
         }
         
-        self.source_counter += 1
-        source_id = f"api_{self.source_counter}"
-        self.sources[source_id] = {
+        source_id = self._register_source("api", {
             "type": "api",
             "url": url,
             "method": method
-        }
+        })
         
         return {
             "status": "success",
@@ -180,7 +315,7 @@ class DataSourcesManager:
             "method": method,
             "response": response_data,
             "document": {
-                "content": json.dumps(response_data),
+                "content": _json_dumps(response_data, pretty=False),
                 "metadata": {
                     "source": url,
                     "type": "api",
@@ -197,17 +332,15 @@ class DataSourcesManager:
             {"id": 2, "text": "Sample database record 2"}
         ]
         
-        self.source_counter += 1
-        source_id = f"db_{self.source_counter}"
-        self.sources[source_id] = {
+        source_id = self._register_source("db", {
             "type": "database",
             "connection": connection_string[:20] + "...",
             "query": query[:50]
-        }
+        })
         
         documents = [
             {
-                "content": json.dumps(row),
+                "content": _json_dumps(row, pretty=False),
                 "metadata": {
                     "source": "database",
                     "query": query,
@@ -225,6 +358,12 @@ class DataSourcesManager:
             "count": len(documents)
         }
     
+    def _register_source(self, prefix: str, info: Dict) -> str:
+        """Record a new source and return its id."""
+        source_id = "%s_%d" % (prefix, next(self._source_ids))
+        self.sources[source_id] = info
+        return source_id
+    
     def list_sources(self) -> dict:
         """List available data sources."""
         return {
@@ -247,11 +386,7 @@ class DataSourcesManager:
                 "message": f"Source not found: {source_id}"
             }
         
-        return {
-            "status": "success",
-            "source_id": source_id,
-            **self.sources[source_id]
-        }
+        return dict(self.sources[source_id], status="success", source_id=source_id)
 
 
 # Initialize
@@ -351,10 +486,10 @@ if app:
             else:
                 result = {"error": f"Unknown tool: {name}"}
             
-            return [TextContent(type="text", text=json.dumps(result, indent=2))]
+            return [TextContent(type="text", text=_json_dumps(result))]
         except Exception as e:
             logger.error(f"Error in {name}: {e}")
-            return [TextContent(type="text", text=json.dumps({"error": str(e)}))]
+            return [TextContent(type="text", text=_json_dumps({"error": str(e)}))]
 
 
 async def main():
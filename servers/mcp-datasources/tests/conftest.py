@@ -5,8 +5,6 @@ Shared test fixtures for mcp-datasources tests.
 import pytest
 import sys
 import os
-import tempfile
-from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -19,46 +17,37 @@ def datasources():
     return DataSourcesManager()
 
 
-@pytest.fixture
-def temp_text_file():
+@pytest.fixture(scope="session")
+def temp_text_file(tmp_path_factory):
     """Create a temporary text file."""
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False, encoding='utf-8') as f:
-        f.write("This is a test document.\n")
-        f.write("It contains multiple lines.\n")
-        f.write("Perfect for testing file loading functionality.\n")
-        temp_path = f.name
-
-    yield temp_path
-
-    # Cleanup
-    try:
-        Path(temp_path).unlink()
-    except:
-        pass
-
-
-@pytest.fixture
-def temp_markdown_file():
+    path = tmp_path_factory.mktemp("text") / "document.txt"
+    path.write_text(
+        "This is a test document.\n"
+        "It contains multiple lines.\n"
+        "Perfect for testing file loading functionality.\n",
+        encoding='utf-8'
+    )
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def temp_markdown_file(tmp_path_factory):
     """Create a temporary markdown file."""
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False, encoding='utf-8') as f:
-        f.write("# Test Document\n\n")
-        f.write("## Introduction\n\n")
-        f.write("This is a markdown file for testing.\n\n")
-        f.write("## Content\n\n")
-        f.write("- Item 1\n")
-        f.write("- Item 2\n")
-        temp_path = f.name
-
-    yield temp_path
-
-    try:
-        Path(temp_path).unlink()
-    except:
-        pass
-
-
-@pytest.fixture
-def temp_json_file():
+    path = tmp_path_factory.mktemp("markdown") / "document.md"
+    path.write_text(
+        "# Test Document\n\n"
+        "## Introduction\n\n"
+        "This is a markdown file for testing.\n\n"
+        "## Content\n\n"
+        "- Item 1\n"
+        "- Item 2\n",
+        encoding='utf-8'
+    )
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def temp_json_file(tmp_path_factory):
     """Create a temporary JSON file."""
     import json
 
@@ -74,60 +63,41 @@ def temp_json_file():
         }
     }
 
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False, encoding='utf-8') as f:
-        json.dump(data, f, indent=2)
-        temp_path = f.name
-
-    yield temp_path
-
-    try:
-        Path(temp_path).unlink()
-    except:
-        pass
+    path = tmp_path_factory.mktemp("json") / "data.json"
+    path.write_text(json.dumps(data, indent=2), encoding='utf-8')
+    return str(path)
 
 
-@pytest.fixture
-def temp_csv_file():
+@pytest.fixture(scope="session")
+def temp_csv_file(tmp_path_factory):
     """Create a temporary CSV file."""
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.csv', delete=False, encoding='utf-8') as f:
-        f.write("name,age,city,occupation\n")
-        f.write("Alice,30,NYC,Engineer\n")
-        f.write("Bob,25,LA,Designer\n")
-        f.write("Charlie,35,Chicago,Manager\n")
-        temp_path = f.name
-
-    yield temp_path
-
-    try:
-        Path(temp_path).unlink()
-    except:
-        pass
-
+    path = tmp_path_factory.mktemp("csv") / "data.csv"
+    path.write_text(
+        "name,age,city,occupation\n"
+        "Alice,30,NYC,Engineer\n"
+        "Bob,25,LA,Designer\n"
+        "Charlie,35,Chicago,Manager\n",
+        encoding='utf-8'
+    )
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def temp_directory(tmp_path_factory):
+    """Create a temporary directory with multiple files (shared, read-only)."""
+    files = {
+        "file1.txt": b"Content of file 1",
+        "file2.txt": b"Content of file 2",
+        "readme.md": b"# README\n\nProject documentation",
+        "data.json": b'{"key": "value"}',
+        "subdir/nested.txt": b"Nested file content",
+    }
 
-@pytest.fixture
-def temp_directory():
-    """Create a temporary directory with multiple files."""
-    temp_dir = tempfile.mkdtemp()
-
-    # Create various test files
-    (Path(temp_dir) / "file1.txt").write_text("Content of file 1", encoding='utf-8')
-    (Path(temp_dir) / "file2.txt").write_text("Content of file 2", encoding='utf-8')
-    (Path(temp_dir) / "readme.md").write_text("# README\n\nProject documentation", encoding='utf-8')
-    (Path(temp_dir) / "data.json").write_text('{"key": "value"}', encoding='utf-8')
-
-    # Create subdirectory
-    subdir = Path(temp_dir) / "subdir"
-    subdir.mkdir()
-    (subdir / "nested.txt").write_text("Nested file content", encoding='utf-8')
-
-    yield temp_dir
-
-    # Cleanup
-    import shutil
-    try:
-        shutil.rmtree(temp_dir)
-    except:
-        pass
+    temp_dir = tmp_path_factory.mktemp("ds")
+    (temp_dir / "subdir").mkdir()
+    for name, content in files.items():
+        (temp_dir / name).write_bytes(content)
+    return str(temp_dir)
 
 
 @pytest.fixture
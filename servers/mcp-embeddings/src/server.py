@@ -7,7 +7,13 @@ Generate embeddings using various models (OpenAI, local transformers).
 import json
 import logging
 import os
-from typing import Any, Optional, List
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, List, Tuple
 
 try:
     from mcp.server import Server
@@ -19,6 +25,7 @@ except ImportError:
 
 # Optional imports
 try:
+    import httpx
     import openai
     OPENAI_AVAILABLE = True
 except ImportError:
@@ -32,12 +39,140 @@ except ImportError:
 
 import numpy as np
 
+from .utils import batch_texts, hash_text, seed_from_hash
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Persistent connections kept open to the OpenAI API
+OPENAI_POOL_SIZE = 50
+OPENAI_TIMEOUT = 30.0
+
+# Per-request limits of the OpenAI embeddings endpoint
+OPENAI_MAX_BATCH = 2048
+OPENAI_MAX_BATCH_TOKENS = 300_000
+OPENAI_MAX_WORKERS = 8
+
+# Texts per forward pass when encoding with a local model
+LOCAL_BATCH_SIZE = 256
+
+
+class EmbeddingMatrix:
+    """In-memory embeddings for one model, stored as rows of a float32 matrix.
+
+    Rows are addressed by ``hash_text`` digest. Keeping the vectors in one
+    contiguous array (grown by doubling) lets callers score every cached
+    embedding at once, e.g. ``store.vectors @ query``.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._rows = {}
+        self._matrix = None
+        self._size = 0
+        self._initial_capacity = initial_capacity
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._rows
+
+    def get(self, digest: str) -> Optional[np.ndarray]:
+        row = self._rows.get(digest)
+        return None if row is None else self._matrix[row]
+
+    @property
+    def digests(self) -> List[str]:
+        """Digests in row order."""
+        return list(self._rows)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the stored embeddings, one row per digest."""
+        if self._matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._matrix[:self._size]
+
+    def update(self, items: Dict[str, np.ndarray]) -> None:
+        for digest, vector in items.items():
+            row = self._rows.get(digest)
+            if row is None:
+                row = self._append_row(len(vector))
+                self._rows[digest] = row
+            self._matrix[row] = vector
+
+    def _append_row(self, dimensions: int) -> int:
+        if self._matrix is None:
+            self._matrix = np.empty(
+                (self._initial_capacity, dimensions), dtype=np.float32
+            )
+        elif self._size == len(self._matrix):
+            grown = np.empty(
+                (2 * len(self._matrix), dimensions), dtype=np.float32
+            )
+            grown[:self._size] = self._matrix
+            self._matrix = grown
+        self._size += 1
+        return self._size - 1
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store keyed by model and content hash.
+
+    Vectors are stored as raw float32 blobs so warm runs read embeddings
+    from disk instead of recomputing them or calling the API again.
+    """
+
+    # Stay well below SQLite's bound-parameter limit on older builds
+    _LOOKUP_CHUNK = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Look up several keys, returning only the ones that are stored."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), self._LOOKUP_CHUNK):
+                chunk = keys[i:i + self._LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    "SELECT key, vector FROM embeddings WHERE key IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    chunk
+                )
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        """Store several embeddings in one transaction."""
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in items.items()
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                rows
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
 
 class EmbeddingManager:
-    """Manages embedding generation across different providers."""
+    """Manages embedding generation across different providers.
+
+    Embeddings are held as float32 arrays internally and only converted to
+    lists when a result is returned.
+    """
     
     MODELS = {
         "text-embedding-3-small": {"provider": "openai", "dimensions": 1536},
@@ -47,66 +182,201 @@ class EmbeddingManager:
         "all-mpnet-base-v2": {"provider": "local", "dimensions": 768},
         "e5-large-v2": {"provider": "local", "dimensions": 1024}
     }
+
+    # Shared, read-only configuration for models not listed in MODELS
+    DEFAULT_MODEL_INFO = MappingProxyType({"provider": "mock", "dimensions": 1536})
     
-    def __init__(self, default_model: str = "text-embedding-3-small"):
+    def __init__(self, default_model: str = "text-embedding-3-small",
+                 cache_dir: Optional[str] = None, max_local_models: int = 2):
         self.current_model = default_model
         self.openai_client = None
-        self.local_model = None
+        self.local_models = OrderedDict()
+        self.max_local_models = max_local_models
         self.cache = {}
+        self.disk_cache = None
+        self._embedders = {}
         
         # Initialize OpenAI if available
         if OPENAI_AVAILABLE and os.getenv("OPENAI_API_KEY"):
-            self.openai_client = openai.OpenAI()
+            self.openai_client = openai.OpenAI(
+                http_client=httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_POOL_SIZE,
+                        max_keepalive_connections=OPENAI_POOL_SIZE
+                    ),
+                    timeout=OPENAI_TIMEOUT
+                )
+            )
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.disk_cache = EmbeddingCache(
+                os.path.join(cache_dir, "embeddings.sqlite3")
+            )
         
-    def _get_model_info(self, model: str) -> dict:
+    def _get_model_info(self, model: str) -> Mapping[str, Any]:
         """Get model configuration."""
-        return self.MODELS.get(model, {"provider": "mock", "dimensions": 1536})
+        return self.MODELS.get(model, self.DEFAULT_MODEL_INFO)
     
     def _load_local_model(self, model: str):
-        """Load a local sentence transformer model."""
-        if TRANSFORMERS_AVAILABLE:
-            self.local_model = SentenceTransformer(model)
-        else:
+        """Return a local sentence transformer model, loading it on first use.
+
+        Loaded models stay resident, least recently used first out once
+        more than ``max_local_models`` are held. Models placed on a GPU are
+        cast to float16.
+        """
+        if model in self.local_models:
+            self.local_models.move_to_end(model)
+            return self.local_models[model]
+        if not TRANSFORMERS_AVAILABLE:
             logger.warning("sentence-transformers not available")
+            return None
+        loaded = SentenceTransformer(model)
+        if loaded.device.type == "cuda":
+            loaded.half()
+        self.local_models[model] = loaded
+        if len(self.local_models) > self.max_local_models:
+            self.local_models.popitem(last=False)
+        return loaded
+
+    def _model_cache(self, model: str) -> EmbeddingMatrix:
+        store = self.cache.get(model)
+        if store is None:
+            store = self.cache[model] = EmbeddingMatrix()
+        return store
+
+    def _lookup_cached(self, model: str,
+                       digests: List[str]) -> Dict[str, np.ndarray]:
+        """Resolve digests from memory, then from the disk cache."""
+        store = self._model_cache(model)
+        found = {d: store.get(d) for d in digests if d in store}
+        if self.disk_cache is not None and len(found) < len(digests):
+            prefix = self._disk_prefix(model)
+            on_disk = {
+                key[len(prefix):]: vector
+                for key, vector in self.disk_cache.get_many(
+                    [prefix + d for d in digests if d not in found]
+                ).items()
+            }
+            store.update(on_disk)
+            found.update(on_disk)
+        return found
+
+    def _store_cached(self, model: str, items: Dict[str, np.ndarray]) -> None:
+        self._model_cache(model).update(items)
+        if self.disk_cache is not None and items:
+            prefix = self._disk_prefix(model)
+            self.disk_cache.put_many(
+                {prefix + d: vector for d, vector in items.items()}
+            )
+
+    def _disk_prefix(self, model: str) -> str:
+        """Disk cache key prefix; the backend keeps mock vectors apart from real ones."""
+        return f"{self._resolve_embedder(model)[0]}:{model}:"
+
+    def _embed_openai(self, texts: List[str], digests: List[str],
+                      model: str) -> np.ndarray:
+        """Embed texts with OpenAI, splitting oversized batches.
+
+        Sub-batches respect the endpoint's item and token limits and are
+        sent concurrently over the pooled client.
+        """
+        def request(batch: List[str]) -> np.ndarray:
+            data = self.openai_client.embeddings.create(
+                input=batch,
+                model=model
+            ).data
+            # Fill rows of one preallocated block rather than building an
+            # intermediate list of lists
+            out = np.empty((len(data), len(data[0].embedding)), dtype=np.float32)
+            for row, item in zip(out, data):
+                row[:] = item.embedding
+            return out
+
+        batches = batch_texts(texts, OPENAI_MAX_BATCH, OPENAI_MAX_BATCH_TOKENS)
+        if len(batches) == 1:
+            return request(batches[0])
+        max_workers = min(OPENAI_MAX_WORKERS, len(batches))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return np.concatenate(list(executor.map(request, batches)))
+
+    def _embed_local(self, texts: List[str], digests: List[str],
+                     model: str) -> np.ndarray:
+        """Embed texts with a local sentence transformer."""
+        local_model = self._load_local_model(model)
+        return np.asarray(
+            local_model.encode(
+                texts,
+                batch_size=LOCAL_BATCH_SIZE,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            ),
+            dtype=np.float32
+        )
+
+    def _embed_mock(self, texts: List[str], digests: List[str],
+                    dimensions: int) -> np.ndarray:
+        """Deterministic random embeddings: one seeded generator per text."""
+        embeddings = np.empty((len(digests), dimensions), dtype=np.float32)
+        for row, digest in zip(embeddings, digests):
+            np.random.default_rng(seed_from_hash(digest)).standard_normal(
+                dtype=np.float32, out=row
+            )
+        return embeddings
+
+    def _get_embedder(self, model: str) -> Callable[[List[str], List[str]], np.ndarray]:
+        """Resolve the embedding function for ``model`` once and reuse it.
+
+        The returned callable takes texts and their ``hash_text`` digests and
+        returns a float32 array with one row per text. Resolution depends on
+        the configured providers, so it is cleared when a model is
+        reconfigured.
+        """
+        return self._resolve_embedder(model)[1]
+
+    def _resolve_embedder(self, model: str) -> Tuple[str, Callable]:
+        """The backend name ("openai", "local" or "mock") and embedder for ``model``."""
+        resolved = self._embedders.get(model)
+        if resolved is None:
+            model_info = self._get_model_info(model)
+            if model_info["provider"] == "openai" and self.openai_client:
+                resolved = ("openai", partial(self._embed_openai, model=model))
+            elif model_info["provider"] == "local" and TRANSFORMERS_AVAILABLE:
+                resolved = ("local", partial(self._embed_local, model=model))
+            else:
+                resolved = ("mock", partial(self._embed_mock,
+                                            dimensions=model_info["dimensions"]))
+            self._embedders[model] = resolved
+        return resolved
     
     def embed_text(self, text: str, model: Optional[str] = None) -> dict:
         """Generate embedding for single text."""
         model = model or self.current_model
-        model_info = self._get_model_info(model)
         
-        # Check cache
-        cache_key = f"{model}:{hash(text)}"
-        if cache_key in self.cache:
+        # Check cache before resolving the provider
+        digest = hash_text(text)
+        store = self.cache.get(model)
+        embedding = store.get(digest) if store is not None else None
+        if embedding is None and self.disk_cache is not None:
+            embedding = self._lookup_cached(model, [digest]).get(digest)
+        if embedding is not None:
             return {
                 "status": "success",
-                "embedding": self.cache[cache_key],
+                "embedding": embedding.tolist(),
                 "model": model,
-                "dimensions": len(self.cache[cache_key]),
+                "dimensions": len(embedding),
                 "cached": True
             }
         
         try:
-            if model_info["provider"] == "openai" and self.openai_client:
-                response = self.openai_client.embeddings.create(
-                    input=text,
-                    model=model
-                )
-                embedding = response.data[0].embedding
-            elif model_info["provider"] == "local" and TRANSFORMERS_AVAILABLE:
-                if self.local_model is None or self.local_model._first_module().auto_model.name_or_path != model:
-                    self._load_local_model(model)
-                embedding = self.local_model.encode(text).tolist()
-            else:
-                # Mock embedding
-                np.random.seed(hash(text) % (2**32))
-                embedding = np.random.randn(model_info["dimensions"]).tolist()
+            embedding = self._get_embedder(model)([text], [digest])[0]
             
             # Cache result
-            self.cache[cache_key] = embedding
+            self._store_cached(model, {digest: embedding})
             
             return {
                 "status": "success",
-                "embedding": embedding,
+                "embedding": embedding.tolist(),
                 "model": model,
                 "dimensions": len(embedding)
             }
@@ -115,34 +385,44 @@ class EmbeddingManager:
             return {"status": "error", "message": str(e)}
     
     def embed_batch(self, texts: List[str], model: Optional[str] = None) -> dict:
-        """Generate embeddings for multiple texts."""
+        """Generate embeddings for multiple texts.
+
+        Duplicate texts are embedded once and cached embeddings are reused;
+        only the remaining unique texts are sent to the provider. For OpenAI
+        they are split into sub-batches within the item and token limits,
+        which are requested concurrently.
+        """
         model = model or self.current_model
-        model_info = self._get_model_info(model)
         
         try:
-            if model_info["provider"] == "openai" and self.openai_client:
-                response = self.openai_client.embeddings.create(
-                    input=texts,
-                    model=model
+            digests = [hash_text(text) for text in texts]
+            found = self._lookup_cached(model, digests)
+
+            # Index of the first occurrence of each distinct uncached text
+            first_seen = {}
+            for i, digest in enumerate(digests):
+                if digest not in found and digest not in first_seen:
+                    first_seen[digest] = i
+            missing = list(first_seen.values())
+            if missing:
+                computed = self._get_embedder(model)(
+                    [texts[i] for i in missing],
+                    [digests[i] for i in missing]
                 )
-                embeddings = [item.embedding for item in response.data]
-            elif model_info["provider"] == "local" and TRANSFORMERS_AVAILABLE:
-                if self.local_model is None:
-                    self._load_local_model(model)
-                embeddings = self.local_model.encode(texts).tolist()
-            else:
-                # Mock embeddings
-                embeddings = []
-                for text in texts:
-                    np.random.seed(hash(text) % (2**32))
-                    embeddings.append(np.random.randn(model_info["dimensions"]).tolist())
+                new_items = {digests[i]: emb for i, emb in zip(missing, computed)}
+                self._store_cached(model, new_items)
+                found.update(new_items)
+
+            embeddings = (
+                np.stack([found[d] for d in digests]).tolist() if digests else []
+            )
             
             return {
                 "status": "success",
                 "embeddings": embeddings,
                 "model": model,
                 "count": len(embeddings),
-                "dimensions": model_info["dimensions"]
+                "dimensions": self._get_model_info(model)["dimensions"]
             }
         except Exception as e:
             logger.error(f"Error in batch embedding: {e}")
@@ -162,6 +442,9 @@ class EmbeddingManager:
             # Custom model
             self.current_model = model
             self.MODELS[model] = {"provider": provider, "dimensions": 1536}
+            # The backend may change, so drop vectors it produced
+            self._embedders.pop(model, None)
+            self.cache.pop(model, None)
             return {
                 "status": "success",
                 "model": model,
@@ -191,7 +474,8 @@ class EmbeddingManager:
 # Initialize
 app = Server("mcp-embeddings") if Server else None
 manager = EmbeddingManager(
-    default_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    default_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+    cache_dir=os.getenv("EMBEDDING_CACHE_DIR")
 )
 
 TOOLS = [
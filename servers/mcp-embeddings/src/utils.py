@@ -4,7 +4,15 @@ Utility functions for MCP Embeddings Server.
 
 import hashlib
 import logging
-from typing import List, Any
+from functools import lru_cache
+from typing import List, Any, Optional
+
+import numpy as np
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 logger = logging.getLogger(__name__)
 
@@ -12,13 +20,54 @@ logger = logging.getLogger(__name__)
 def hash_text(text: str) -> str:
     """Generate a stable hash for text (for caching).
 
+    Always a 128-bit BLAKE2b digest: the result keys the on-disk cache and
+    seeds mock vectors, so it must not depend on which packages are
+    installed. Unlike the builtin ``hash()``, it is also the same in every
+    process.
+
+    Args:
+        text: Input text
+
+    Returns:
+        Hash string (32 hex characters)
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def seed_from_hash(digest: str) -> int:
+    """Derive a 64-bit RNG seed from a ``hash_text`` digest.
+
+    Args:
+        digest: Hex digest returned by ``hash_text``
+
+    Returns:
+        Seed in ``[0, 2**64)``, suitable for ``numpy.random.default_rng``
+    """
+    return int(digest[:16], 16)
+
+
+@lru_cache(maxsize=4)
+def _get_encoding(name: str):
+    """Load a tiktoken encoding once per process."""
+    return tiktoken.get_encoding(name)
+
+
+def count_tokens(text: str, encoding: str = "cl100k_base") -> int:
+    """Count the tokens in text.
+
+    Exact when tiktoken is installed; otherwise estimated at roughly
+    4 characters per token.
+
     Args:
         text: Input text
+        encoding: Tokenizer encoding to use
 
     Returns:
-        Hash string
+        Number of tokens
     """
-    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    if tiktoken is not None:
+        return len(_get_encoding(encoding).encode(text))
+    return (len(text) + 3) // 4
 
 
 def truncate_text(text: str, max_tokens: int = 8191, encoding: str = "cl100k_base") -> str:
@@ -32,6 +81,14 @@ def truncate_text(text: str, max_tokens: int = 8191, encoding: str = "cl100k_bas
     Returns:
         Truncated text
     """
+    if tiktoken is not None:
+        enc = _get_encoding(encoding)
+        tokens = enc.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        logger.warning(f"Text truncated from {len(tokens)} to {max_tokens} tokens")
+        return enc.decode(tokens[:max_tokens])
+
     # Simple character-based truncation (rough approximation: 1 token ≈ 4 chars)
     max_chars = max_tokens * 4
 
@@ -42,19 +99,37 @@ def truncate_text(text: str, max_tokens: int = 8191, encoding: str = "cl100k_bas
     return text[:max_chars]
 
 
-def batch_texts(texts: List[str], max_batch_size: int = 100) -> List[List[str]]:
+def batch_texts(texts: List[str], max_batch_size: int = 100,
+                max_tokens: Optional[int] = None) -> List[List[str]]:
     """Split texts into batches for efficient processing.
 
     Args:
         texts: List of texts
         max_batch_size: Maximum batch size
+        max_tokens: Optional token budget per batch (see ``count_tokens``);
+            a single text over budget still gets a batch of its own
 
     Returns:
         List of text batches
     """
+    if max_tokens is None:
+        return [texts[i:i + max_batch_size]
+                for i in range(0, len(texts), max_batch_size)]
+
     batches = []
-    for i in range(0, len(texts), max_batch_size):
-        batches.append(texts[i:i + max_batch_size])
+    current = []
+    current_tokens = 0
+    for text in texts:
+        tokens = count_tokens(text)
+        if current and (len(current) >= max_batch_size
+                        or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
     return batches
 
 
@@ -62,7 +137,7 @@ def estimate_cost(num_tokens: int, model: str = "text-embedding-3-small") -> flo
     """Estimate API cost for embedding generation.
 
     Args:
-        num_tokens: Number of tokens
+        num_tokens: Number of tokens (see ``count_tokens``)
         model: Model name
 
     Returns:
@@ -83,20 +158,26 @@ def validate_embedding(embedding: List[float], expected_dim: int) -> bool:
     """Validate embedding vector.
 
     Args:
-        embedding: Embedding vector
+        embedding: Embedding vector (list or 1-D array)
         expected_dim: Expected dimension
 
     Returns:
         True if valid
     """
-    if not isinstance(embedding, list):
+    if not isinstance(embedding, (list, np.ndarray)):
+        return False
+
+    try:
+        arr = np.asarray(embedding)
+    except ValueError:
+        logger.error("Embedding is not a flat numeric vector")
         return False
 
-    if len(embedding) != expected_dim:
+    if arr.shape != (expected_dim,):
         logger.error(f"Invalid embedding dimension: {len(embedding)}, expected {expected_dim}")
         return False
 
-    if not all(isinstance(x, (int, float)) for x in embedding):
+    if arr.dtype.kind not in "biuf" or not np.isfinite(arr).all():
         logger.error("Embedding contains non-numeric values")
         return False
 
@@ -11,12 +11,23 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from src.server import EmbeddingManager
 
 
-@pytest.fixture(scope="function")
-def embeddings_manager():
-    """Create an embeddings manager for testing."""
+@pytest.fixture(scope="session")
+def shared_embeddings_manager():
+    """One embeddings manager per test process (per xdist worker).
+
+    Keeps provider clients and loaded local models alive across tests.
+    """
     return EmbeddingManager(default_model="text-embedding-3-small")
 
 
+@pytest.fixture(scope="function")
+def embeddings_manager(shared_embeddings_manager):
+    """The shared embeddings manager, reset to a clean cache and default model."""
+    shared_embeddings_manager.cache.clear()
+    shared_embeddings_manager.current_model = "text-embedding-3-small"
+    return shared_embeddings_manager
+
+
 @pytest.fixture
 def sample_text():
     """Sample text for embedding."""
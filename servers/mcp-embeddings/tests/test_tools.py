@@ -2,6 +2,9 @@
 Tests for Embeddings tools.
 """
 
+from unittest.mock import Mock
+
+import numpy as np
 import pytest
 from src.server import EmbeddingManager
 
@@ -122,3 +125,129 @@ def test_large_batch(embeddings):
 
     assert result["status"] == "success"
     assert result["count"] == 50
+
+
+def test_mock_embedding_matches_batch(embeddings):
+    """Test that single and batch mock embeddings agree for the same text."""
+    single = embeddings.embed_text("Stable text", model="custom-mock")
+    batch = embeddings.embed_batch(["Stable text"], model="custom-mock")
+
+    assert single["embedding"] == batch["embeddings"][0]
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    """Test that embeddings are reloaded from the on-disk cache."""
+    first = EmbeddingManager(cache_dir=str(tmp_path))
+    original = first.embed_batch(["Persisted text"])["embeddings"][0]
+    first.disk_cache.close()
+
+    second = EmbeddingManager(cache_dir=str(tmp_path))
+    result = second.embed_text("Persisted text")
+
+    assert result["cached"] is True
+    assert result["embedding"] == pytest.approx(original, rel=1e-6)
+
+
+def test_disk_cache_keeps_mock_vectors_from_real_provider(tmp_path):
+    """Test that mock embeddings on disk are not served to a real provider."""
+    first = EmbeddingManager(cache_dir=str(tmp_path))
+    first.embed_text("Persisted text")
+    first.disk_cache.close()
+
+    second = EmbeddingManager(cache_dir=str(tmp_path))
+    second.openai_client = Mock()
+    second.openai_client.embeddings.create.return_value = Mock(
+        data=[Mock(embedding=[0.5] * 1536)]
+    )
+    result = second.embed_text("Persisted text", model="text-embedding-3-small")
+
+    assert "cached" not in result
+    assert result["embedding"] == [0.5] * 1536
+    second.openai_client.embeddings.create.assert_called_once()
+
+
+def test_cache_stores_float32_arrays(embeddings):
+    """Test that cached embeddings are compact float32 arrays."""
+    embeddings.embed_text("Compact storage")
+    embeddings.embed_batch(["More storage", "Compact storage"])
+
+    store = embeddings.cache["text-embedding-3-small"]
+    assert store.vectors.dtype == np.float32
+    assert store.vectors.shape == (2, 1536)
+
+
+def test_batch_embeds_duplicates_once(embeddings):
+    """Test that duplicate texts in a batch reach the provider once."""
+    calls = []
+    compute = embeddings._embed_mock
+
+    def counting(texts, *args, **kwargs):
+        calls.append(list(texts))
+        return compute(texts, *args, **kwargs)
+
+    embeddings._embed_mock = counting
+    embeddings.embed_text("seen")
+    result = embeddings.embed_batch(["a", "seen", "b", "a", "b"])
+
+    assert calls[-1] == ["a", "b"]
+    assert result["count"] == 5
+    assert result["embeddings"][0] == result["embeddings"][3]
+
+
+def test_openai_batches_split_by_item_limit(embeddings, monkeypatch):
+    """Test that oversized OpenAI batches are split and kept in order."""
+    import src.server as server
+    from types import SimpleNamespace
+
+    requests = []
+
+    def create(input, model):
+        requests.append(list(input))
+        return SimpleNamespace(data=[
+            SimpleNamespace(embedding=[float(text)] * 3) for text in input
+        ])
+
+    monkeypatch.setattr(server, "OPENAI_MAX_BATCH", 4)
+    embeddings.openai_client = SimpleNamespace(
+        embeddings=SimpleNamespace(create=create)
+    )
+    texts = [str(i) for i in range(10)]
+
+    result = embeddings.embed_batch(texts, model="text-embedding-3-small")
+
+    assert sorted(len(r) for r in requests) == [2, 4, 4]
+    assert [e[0] for e in result["embeddings"]] == [float(i) for i in range(10)]
+
+
+def test_mock_embedding_stable_across_managers():
+    """Test that mock embeddings do not depend on per-process state."""
+    first = EmbeddingManager().embed_text("Reproducible", model="custom-mock")
+    second = EmbeddingManager().embed_text("Reproducible", model="custom-mock")
+
+    assert first["embedding"] == second["embedding"]
+    assert first["embedding"] != EmbeddingManager().embed_text(
+        "Reproducible!", model="custom-mock"
+    )["embedding"]
+
+
+def test_embedding_matrix_grows_and_keeps_rows():
+    """Test that the row store keeps earlier rows when it reallocates."""
+    from src.server import EmbeddingMatrix
+
+    store = EmbeddingMatrix(initial_capacity=2)
+    store.update({str(i): np.full(3, i, dtype=np.float32) for i in range(5)})
+
+    assert len(store) == 5
+    assert store.digests == ["0", "1", "2", "3", "4"]
+    assert store.vectors[:, 0].tolist() == [0, 1, 2, 3, 4]
+    assert store.get("3").tolist() == [3, 3, 3]
+    assert store.get("missing") is None
+
+
+def test_hash_text_is_fixed_blake2b():
+    """Cache keys and mock seeds use one algorithm in every environment."""
+    import hashlib
+    from src.utils import hash_text
+
+    expected = hashlib.blake2b("Stable text".encode("utf-8"), digest_size=16).hexdigest()
+    assert hash_text("Stable text") == expected
@@ -4,9 +4,18 @@ MCP Generator Server
 Response generation for RAG pipelines.
 """
 
+import asyncio
+import hashlib
 import json
 import logging
-from typing import Any, Optional, List, Dict
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from types import MappingProxyType
+from typing import Any, Callable, Iterator, Mapping, Optional, List, Dict, Sequence, Tuple
 
 try:
     from mcp.server import Server
@@ -16,14 +25,159 @@ except ImportError:
     Server = None
     stdio_server = None
 
+from .utils import compile_template, format_context_with_citations
+
+# Optional imports
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import orjson
+
+    def _json_dumps(obj: Any, pretty: bool = False) -> str:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(obj, option=option).decode("utf-8")
+
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+    def _json_dumps(obj: Any, pretty: bool = False) -> str:
+        if pretty:
+            return json.dumps(obj, indent=2)
+        return json.dumps(obj, separators=(",", ":"))
+
+_EMPTY_METADATA = MappingProxyType({})
+
+# Indent tool output for debugging; compact JSON is the wire default
+PRETTY_JSON = os.getenv("GENERATOR_PRETTY_JSON", "").lower() in ("1", "true", "yes")
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+class SemanticCache:
+    """Reuse responses for paraphrased queries by embedding similarity.
+
+    Query embeddings are kept L2-normalized in a fixed-size ring buffer, so a
+    lookup is a single matrix-vector product. Each entry carries a scope id
+    (template and context) and only entries from the same scope can match.
+
+    Args:
+        embed_fn: Maps a query string to its embedding vector
+        threshold: Minimum cosine similarity for a hit
+        capacity: Maximum number of remembered queries
+    """
+
+    def __init__(self, embed_fn: Callable[[str], Sequence[float]],
+                 threshold: float = 0.9, capacity: int = 10000):
+        if not NUMPY_AVAILABLE:
+            raise ImportError("SemanticCache requires numpy")
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.capacity = capacity
+        self._vectors = None
+        self._scopes = np.zeros(capacity, dtype=np.int64)
+        self._results: List[Optional[dict]] = [None] * capacity
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def embed(self, query: str) -> "np.ndarray":
+        """Embed and L2-normalize a query."""
+        vector = np.asarray(self.embed_fn(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector: "np.ndarray", scope: int) -> Tuple[Optional[dict], float]:
+        """Return the best cached result in ``scope`` and its similarity."""
+        with self._lock:
+            if not self._size:
+                return None, 0.0
+            sims = self._vectors[:self._size] @ vector
+            sims[self._scopes[:self._size] != scope] = -np.inf
+            best = int(np.argmax(sims))
+            if sims[best] >= self.threshold:
+                return self._results[best], float(sims[best])
+            return None, float(sims[best])
+
+    def store(self, vector: "np.ndarray", scope: int, result: dict) -> None:
+        """Remember a result, overwriting the oldest entry when full."""
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.empty((self.capacity, len(vector)), dtype=np.float32)
+            slot = self._next
+            self._vectors[slot] = vector
+            self._scopes[slot] = scope
+            self._results[slot] = dict(result)
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+
+class ResponseCache:
+    """SQLite-backed store of generated responses, shared across restarts.
+
+    Entries are keyed by the manager's response digest and expire at a
+    wall-clock time, so several processes can share one cache file. Expired
+    rows are purged on every write, keeping the file bounded by the TTL.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key BLOB PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)"
+            )
+
+    def get(self, key: bytes) -> Optional[Tuple[dict, float]]:
+        """Return a stored result and its remaining lifetime in seconds."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        remaining = row[1] - time.time()
+        if remaining <= 0:
+            return None
+        return _json_loads(row[0]), remaining
+
+    def put(self, key: bytes, result: dict, ttl: float) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, _json_dumps(result), now + ttl)
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
 class GeneratorManager:
-    """Manages response generation."""
+    """Manages response generation.
+
+    Generated responses are memoized in a bounded LRU cache whose entries
+    expire after ``response_cache_ttl`` seconds.
+    """
     
-    DEFAULT_TEMPLATES = {
+    DEFAULT_TEMPLATES = MappingProxyType({
         "default": """Based on the following context, answer the question.
 
 Context:
@@ -58,19 +212,130 @@ Context:
 Question: {query}
 
 Answer (include [1], [2], etc. for citations):"""
-    }
+    })
+    _DEFAULT_RENDERERS = MappingProxyType({
+        name: compile_template(template)
+        for name, template in DEFAULT_TEMPLATES.items()
+    })
     
-    def __init__(self):
-        self.templates = self.DEFAULT_TEMPLATES.copy()
+    def __init__(self, response_cache_size: int = 1000,
+                 response_cache_ttl: float = 3600.0,
+                 semantic_cache: Optional[SemanticCache] = None,
+                 cache_dir: Optional[str] = None):
+        # Shared read-only defaults until set_prompt_template copies them
+        self.templates: Mapping[str, str] = self.DEFAULT_TEMPLATES
+        self._renderers: Mapping[str, Callable[[str, str], str]] = self._DEFAULT_RENDERERS
+        self.semantic_cache = semantic_cache
+        self.response_cache_size = response_cache_size
+        self.response_cache_ttl = response_cache_ttl
+        self._response_cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+        # Tool calls run in worker threads (see call_tool)
+        self._response_cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._inflight: Dict[bytes, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.disk_cache = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.disk_cache = ResponseCache(os.path.join(cache_dir, "responses.sqlite3"))
+
+    @staticmethod
+    def _response_key(*parts: str) -> bytes:
+        """128-bit BLAKE2b digest of length-prefixed string parts.
+
+        Fixed regardless of installed packages, since keys are persisted
+        in the disk cache.
+        """
+        hasher = hashlib.blake2b(digest_size=16)
+        for part in parts:
+            data = part.encode("utf-8", "surrogatepass")
+            hasher.update(len(data).to_bytes(8, "little"))
+            hasher.update(data)
+        return hasher.digest()
+
+    @staticmethod
+    def _context_str_part(context_str: Optional[str]) -> str:
+        """Key part for a caller-supplied ``context_str``, which shapes the prompt."""
+        # NUL marks "format from context"; any override gets a distinct prefix
+        return "\0" if context_str is None else "=" + context_str
+
+    @staticmethod
+    def _context_key_parts(context: List[Dict]) -> Iterator[str]:
+        """The document fields that shape prompts and citations."""
+        for doc in context:
+            # A leading NUL marks a fallback so it cannot equal a real value
+            yield (str(doc["text"]) if "text" in doc
+                   else "\0" + str(doc.get("content", "")))
+            metadata = doc.get("metadata", {})
+            yield str(metadata["source"]) if "source" in metadata else "\0"
+
+    def _cache_get(self, key: bytes, record: bool = True) -> Optional[dict]:
+        """Look up a response in memory, then in the disk cache.
+
+        ``record=False`` leaves the hit/miss counters untouched, for re-checks
+        of a lookup that has already been counted.
+        """
+        with self._response_cache_lock:
+            entry = self._response_cache.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > time.monotonic():
+                    self._response_cache.move_to_end(key)
+                    self._cache_hits += record
+                    return self._copy_result(result)
+                del self._response_cache[key]
+
+        stored = self.disk_cache.get(key) if self.disk_cache is not None else None
+        with self._response_cache_lock:
+            if stored is None:
+                self._cache_misses += record
+                return None
+            result, remaining = stored
+            self._remember(key, result, remaining)
+            self._cache_hits += record
+            return self._copy_result(result)
+
+    def _cache_put(self, key: bytes, result: dict) -> None:
+        with self._response_cache_lock:
+            self._remember(key, result, self.response_cache_ttl)
+        if self.disk_cache is not None:
+            self.disk_cache.put(key, result, self.response_cache_ttl)
+
+    def _remember(self, key: bytes, result: dict, ttl: float) -> None:
+        """Insert into the in-memory LRU; caller holds the cache lock."""
+        if self.response_cache_size <= 0:
+            return
+        self._response_cache[key] = (time.monotonic() + ttl, self._copy_result(result))
+        self._response_cache.move_to_end(key)
+        if len(self._response_cache) > self.response_cache_size:
+            self._response_cache.popitem(last=False)
+
+    @staticmethod
+    def _copy_result(result: dict) -> dict:
+        """Copy a response down to its list-of-dict fields (e.g. citations)."""
+        return {
+            field: [dict(item) if isinstance(item, dict) else item for item in value]
+            if isinstance(value, list) else value
+            for field, value in result.items()
+        }
+
+    def cache_stats(self) -> dict:
+        """Report response cache usage."""
+        lookups = self._cache_hits + self._cache_misses
+        return {
+            "status": "success",
+            "size": len(self._response_cache),
+            "max_size": self.response_cache_size,
+            "ttl_seconds": self.response_cache_ttl,
+            "hits": self._cache_hits,
+            "misses": self._cache_misses,
+            "hit_rate": self._cache_hits / lookups if lookups else 0.0
+        }
         
     def _format_context(self, documents: List[Dict]) -> str:
         """Format documents into context string."""
-        formatted = []
-        for i, doc in enumerate(documents, 1):
-            text = doc.get("text", doc.get("content", ""))
-            source = doc.get("metadata", {}).get("source", f"Document {i}")
-            formatted.append(f"[{i}] {source}:\n{text}")
-        return "\n\n".join(formatted)
+        return format_context_with_citations(documents)
     
     def _mock_generate(self, prompt: str) -> str:
         """Mock generation for development."""
@@ -86,15 +351,67 @@ Answer (include [1], [2], etc. for citations):"""
         return f"Based on the provided context, here is the answer to {question}: The documents indicate relevant information that addresses your question. Please note that this is a mock response for development purposes."
     
     def generate_response(self, query: str, context: List[Dict],
-                         template: str = "default") -> dict:
-        """Generate answer from context."""
-        template_str = self.templates.get(template, self.templates["default"])
-        context_str = self._format_context(context)
+                         template: str = "default",
+                         context_str: Optional[str] = None) -> dict:
+        """Generate answer from context.
+
+        ``context_str`` may carry ``context`` already formatted by
+        ``_format_context``, letting callers format once across tools.
+        """
+        template_name = template if template in self.templates else "default"
+        template_str = self.templates[template_name]
+        scope = self._response_key(
+            "response", template, template_str, self._context_str_part(context_str),
+            *self._context_key_parts(context)
+        )
+        key = self._response_key(scope.hex(), query)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        # Single-flight: concurrent identical requests wait on the first one
+        with self._inflight_lock:
+            pending = self._inflight.get(key)
+            if pending is None:
+                self._inflight[key] = future = Future()
+        if pending is not None:
+            return dict(pending.result())
+
+        try:
+            # A previous leader may have stored the result since our lookup
+            result = self._cache_get(key, record=False)
+            if result is None:
+                result = self._generate_response(
+                    query, context, template, template_name, scope, key, context_str
+                )
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        return result
+
+    def _generate_response(self, query: str, context: List[Dict], template: str,
+                           template_name: str, scope: bytes, key: bytes,
+                           context_str: Optional[str]) -> dict:
+        if self.semantic_cache is not None:
+            # Paraphrases of an earlier query over the same context and template
+            query_vector = self.semantic_cache.embed(query)
+            scope_id = int.from_bytes(scope[:8], "little", signed=True)
+            similar, similarity = self.semantic_cache.lookup(query_vector, scope_id)
+            if similar is not None:
+                return dict(similar, query=query, semantic_similarity=similarity)
+
+        if context_str is None:
+            context_str = self._format_context(context)
         
-        prompt = template_str.format(context=context_str, query=query)
+        prompt = self._renderers[template_name](context_str, query)
         response = self._mock_generate(prompt)
         
-        return {
+        result = {
             "status": "success",
             "query": query,
             "response": response,
@@ -102,11 +419,17 @@ Answer (include [1], [2], etc. for citations):"""
             "context_docs": len(context),
             "prompt_length": len(prompt)
         }
+        self._cache_put(key, result)
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(query_vector, scope_id, result)
+        return result
     
     def summarize_context(self, documents: List[Dict], 
-                         max_length: int = 500) -> dict:
+                         max_length: int = 500,
+                         context_str: Optional[str] = None) -> dict:
         """Summarize retrieved documents."""
-        context_str = self._format_context(documents)
+        if context_str is None:
+            context_str = self._format_context(documents)
         
         # Mock summarization
         words = context_str.split()
@@ -125,8 +448,6 @@ Answer (include [1], [2], etc. for citations):"""
     
     def extract_info(self, documents: List[Dict], schema: Dict) -> dict:
         """Extract structured information from documents."""
-        context_str = self._format_context(documents)
-        
         # Mock extraction based on schema
         extracted = {}
         for field, field_schema in schema.get("properties", {}).items():
@@ -149,42 +470,55 @@ Answer (include [1], [2], etc. for citations):"""
             "source_documents": len(documents)
         }
     
-    def generate_with_citations(self, query: str, context: List[Dict]) -> dict:
+    def generate_with_citations(self, query: str, context: List[Dict],
+                                context_str: Optional[str] = None) -> dict:
         """Generate response with source citations."""
-        context_str = self._format_context(context)
+        key = self._response_key(
+            "citations", query, self.templates["citation"],
+            self._context_str_part(context_str), *self._context_key_parts(context)
+        )
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        if context_str is None:
+            context_str = self._format_context(context)
         
-        prompt = self.templates["citation"].format(context=context_str, query=query)
+        prompt = self._renderers["citation"](context_str, query)
         
-        # Generate response with mock citations
-        response_parts = []
-        response_parts.append(f"Based on the available sources, here is the answer to your question about '{query}':")
+        # Generate response with mock citations, one pass over the documents
+        response_parts = [f"Based on the available sources, here is the answer to your question about '{query}':"]
+        citations = []
         
-        for i, doc in enumerate(context[:3], 1):
-            text = doc.get("text", "")[:100]
-            response_parts.append(f"\nAccording to source [{i}]: {text}...")
+        for i, doc in enumerate(context, 1):
+            snippet = doc.get("text", "")[:200]
+            if i <= 3:
+                response_parts.append(f"\nAccording to source [{i}]: {snippet[:100]}...")
+            metadata = doc.get("metadata") or _EMPTY_METADATA
+            citations.append({
+                "index": i,
+                "source": metadata.get("source", f"Document {i}"),
+                "text_snippet": snippet
+            })
         
         response = " ".join(response_parts)
         
-        citations = [
-            {
-                "index": i,
-                "source": doc.get("metadata", {}).get("source", f"Document {i}"),
-                "text_snippet": doc.get("text", "")[:200]
-            }
-            for i, doc in enumerate(context, 1)
-        ]
-        
-        return {
+        result = {
             "status": "success",
             "query": query,
             "response": response,
             "citations": citations,
             "num_citations": len(citations)
         }
+        self._cache_put(key, result)
+        return result
     
     def set_prompt_template(self, name: str, template: str) -> dict:
         """Configure custom prompt template."""
-        self.templates[name] = template
+        # Copy-on-write: replace both mappings so readers in other threads
+        # see either the old or the new template set, and defaults stay intact
+        self._renderers = {**self._renderers, name: compile_template(template)}
+        self.templates = {**self.templates, name: template}
         
         return {
             "status": "success",
@@ -196,7 +530,7 @@ Answer (include [1], [2], etc. for citations):"""
 
 # Initialize
 app = Server("mcp-generator") if Server else None
-manager = GeneratorManager()
+manager = GeneratorManager(cache_dir=os.getenv("GENERATOR_CACHE_DIR"))
 
 TOOLS = [
     Tool(
@@ -270,23 +604,24 @@ if app:
     @app.call_tool()
     async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         try:
+            # Generation may block on a model backend; keep the event loop free
             if name == "generate_response":
-                result = manager.generate_response(**arguments)
+                result = await asyncio.to_thread(manager.generate_response, **arguments)
             elif name == "summarize_context":
-                result = manager.summarize_context(**arguments)
+                result = await asyncio.to_thread(manager.summarize_context, **arguments)
             elif name == "extract_info":
-                result = manager.extract_info(**arguments)
+                result = await asyncio.to_thread(manager.extract_info, **arguments)
             elif name == "generate_with_citations":
-                result = manager.generate_with_citations(**arguments)
+                result = await asyncio.to_thread(manager.generate_with_citations, **arguments)
             elif name == "set_prompt_template":
                 result = manager.set_prompt_template(**arguments)
             else:
                 result = {"error": f"Unknown tool: {name}"}
             
-            return [TextContent(type="text", text=json.dumps(result, indent=2))]
+            return [TextContent(type="text", text=_json_dumps(result, pretty=PRETTY_JSON))]
         except Exception as e:
             logger.error(f"Error in {name}: {e}")
-            return [TextContent(type="text", text=json.dumps({"error": str(e)}))]
+            return [TextContent(type="text", text=_json_dumps({"error": str(e)}))]
 
 
 async def main():
@@ -296,5 +631,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
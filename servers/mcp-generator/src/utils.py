@@ -3,10 +3,25 @@ Utility functions for MCP Generator Server.
 """
 
 import logging
-from typing import List, Dict, Any
+import re
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+from operator import itemgetter
+from string import Formatter
+from typing import Callable, List, Dict, Any, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 logger = logging.getLogger(__name__)
 
+_CITATION_RE = re.compile(r'\[(\d+)\]')
+_SENTENCE_END_RE = re.compile(r'[.!?]+')
+_REQUIRED_PLACEHOLDERS = ("{context}", "{query}")
+
 
 def format_context_with_citations(documents: List[Dict[str, Any]]) -> str:
     """Format documents into context string with citation markers.
@@ -17,13 +32,11 @@ def format_context_with_citations(documents: List[Dict[str, Any]]) -> str:
     Returns:
         Formatted context string
     """
-    formatted = []
-    for i, doc in enumerate(documents, 1):
-        text = doc.get("text", doc.get("content", ""))
-        source = doc.get("metadata", {}).get("source", f"Document {i}")
-        formatted.append(f"[{i}] {source}:\n{text}")
-
-    return "\n\n".join(formatted)
+    return "\n\n".join(
+        f"[{i}] {doc.get('metadata', {}).get('source', f'Document {i}')}:\n"
+        f"{doc.get('text', doc.get('content', ''))}"
+        for i, doc in enumerate(documents, 1)
+    )
 
 
 def extract_citations(response_text: str) -> List[int]:
@@ -35,9 +48,10 @@ def extract_citations(response_text: str) -> List[int]:
     Returns:
         List of cited document numbers
     """
-    import re
-    citations = re.findall(r'\[(\d+)\]', response_text)
-    return sorted(set(int(c) for c in citations))
+    # Most responses without citations have no brackets at all
+    if "[" not in response_text:
+        return []
+    return sorted({int(c) for c in _CITATION_RE.findall(response_text)})
 
 
 def truncate_context(documents: List[Dict[str, Any]], max_length: int = 4000) -> List[Dict[str, Any]]:
@@ -50,26 +64,63 @@ def truncate_context(documents: List[Dict[str, Any]], max_length: int = 4000) ->
     Returns:
         Truncated document list
     """
-    truncated = []
-    current_length = 0
-
-    for doc in documents:
-        text = doc.get("text", "")
-        if current_length + len(text) > max_length:
-            # Add partial document
-            remaining = max_length - current_length
-            if remaining > 100:  # Only add if meaningful amount left
-                truncated_doc = doc.copy()
-                truncated_doc["text"] = text[:remaining] + "..."
-                truncated.append(truncated_doc)
-            break
-
-        truncated.append(doc)
-        current_length += len(text)
+    # Running totals are non-decreasing, so the cutoff is a binary search
+    totals = list(accumulate(len(doc.get("text", "")) for doc in documents))
+    cutoff = bisect_right(totals, max_length)
+    truncated = documents[:cutoff]
+
+    if cutoff < len(documents):
+        # Add partial document
+        remaining = max_length - (totals[cutoff - 1] if cutoff else 0)
+        if remaining > 100:  # Only add if meaningful amount left
+            truncated_doc = documents[cutoff].copy()
+            truncated_doc["text"] = truncated_doc.get("text", "")[:remaining] + "..."
+            truncated.append(truncated_doc)
 
     return truncated
 
 
+def compile_template(template: str) -> Callable[[str, str], str]:
+    """Pre-split a prompt template into a fast ``render(context, query)``.
+
+    The template is parsed once into literal chunks and ``{context}`` /
+    ``{query}`` slots, so rendering is a single join instead of a
+    ``str.format`` call. Templates using any other field, a format spec or a
+    conversion, or that fail to parse, keep ``str.format`` semantics
+    (including its errors at render time).
+
+    Args:
+        template: Template string
+
+    Returns:
+        Function taking context and query strings and returning the prompt
+    """
+    def fallback(context: str, query: str) -> str:
+        return template.format(context=context, query=query)
+
+    # Rendering picks from (context, query, *literals) in template order
+    literals = []
+    order = []
+    try:
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if literal:
+                order.append(2 + len(literals))
+                literals.append(literal)
+            if field is None:
+                continue
+            if field not in ("context", "query") or spec or conversion:
+                return fallback
+            order.append(0 if field == "context" else 1)
+    except ValueError:
+        return fallback
+
+    if not order:
+        return lambda context, query: ""
+    pick = itemgetter(*order)
+    literals = tuple(literals)
+    return lambda context, query: "".join(pick((context, query) + literals))
+
+
 def validate_template(template: str) -> bool:
     """Validate prompt template has required placeholders.
 
@@ -79,11 +130,9 @@ def validate_template(template: str) -> bool:
     Returns:
         True if valid
     """
-    required_placeholders = ["{context}", "{query}"]
-
-    for placeholder in required_placeholders:
+    for placeholder in _REQUIRED_PLACEHOLDERS:
         if placeholder not in template:
-            logger.error(f"Template missing required placeholder: {placeholder}")
+            logger.error("Template missing required placeholder: %s", placeholder)
             return False
 
     return True
@@ -102,6 +151,33 @@ def estimate_prompt_tokens(prompt: str, chars_per_token: float = 4.0) -> int:
     return int(len(prompt) / chars_per_token)
 
 
+@lru_cache(maxsize=4)
+def _get_encoding(name: str):
+    """Load a tiktoken encoding once per process."""
+    return tiktoken.get_encoding(name)
+
+
+def estimate_prompt_tokens_batch(prompts: Sequence[str], chars_per_token: float = 4.0,
+                                 encoding: Optional[str] = None) -> List[int]:
+    """Estimate token counts for many prompts in one call.
+
+    With ``encoding`` set and tiktoken installed, prompts are tokenized
+    exactly with ``encode_batch``, which runs on multiple threads outside
+    the GIL. Otherwise this is ``estimate_prompt_tokens`` over each prompt.
+
+    Args:
+        prompts: Prompt strings
+        chars_per_token: Average characters per token
+        encoding: Optional tiktoken encoding name (e.g. "cl100k_base")
+
+    Returns:
+        Token count per prompt
+    """
+    if encoding is not None and tiktoken is not None:
+        return [len(tokens) for tokens in _get_encoding(encoding).encode_batch(list(prompts))]
+    return [int(len(prompt) / chars_per_token) for prompt in prompts]
+
+
 def create_summary_from_docs(documents: List[Dict[str, Any]], max_sentences: int = 5) -> str:
     """Create a quick summary from documents.
 
@@ -112,12 +188,29 @@ def create_summary_from_docs(documents: List[Dict[str, Any]], max_sentences: int
     Returns:
         Summary text
     """
-    import re
-
-    all_text = " ".join(doc.get("text", "") for doc in documents)
-    sentences = re.split(r'[.!?]+', all_text)
-    sentences = [s.strip() for s in sentences if s.strip()]
+    # Stream sentences document by document and stop once enough are found.
+    # Text after a document's last terminator carries over to the next one,
+    # as if the documents had been joined with spaces.
+    summary_sentences = []
+    pending = ""
+    if max_sentences > 0:
+        for i, doc in enumerate(documents):
+            text = doc.get("text", "")
+            if i:
+                pending += " "
+            start = 0
+            for match in _SENTENCE_END_RE.finditer(text):
+                sentence = (pending + text[start:match.start()]).strip()
+                pending = ""
+                start = match.end()
+                if sentence:
+                    summary_sentences.append(sentence)
+                    if len(summary_sentences) == max_sentences:
+                        return ". ".join(summary_sentences) + "."
+            pending += text[start:]
+
+        sentence = pending.strip()
+        if sentence:
+            summary_sentences.append(sentence)
 
-    # Take first max_sentences
-    summary_sentences = sentences[:max_sentences]
     return ". ".join(summary_sentences) + "." if summary_sentences else ""
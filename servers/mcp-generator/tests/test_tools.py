@@ -2,6 +2,10 @@
 Tests for Generator tools.
 """
 
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 from src.server import GeneratorManager
 
@@ -165,3 +169,176 @@ def test_citation_format(generator, sample_context):
     assert all("index" in c for c in citations)
     assert all("source" in c for c in citations)
     assert all("text_snippet" in c for c in citations)
+
+
+def test_response_cache(generator, sample_context):
+    """Test that repeated generations are served from the cache."""
+    first = generator.generate_response("What is ML?", sample_context)
+    second = generator.generate_response("What is ML?", sample_context)
+    generator.generate_response("What is DL?", sample_context)
+
+    assert first == second
+    stats = generator.cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_response_cache_respects_context_str(generator, sample_context):
+    """Test that a caller-supplied context_str is part of the cache key."""
+    default = generator.generate_response("What is ML?", sample_context)
+    custom = generator.generate_response("What is ML?", sample_context, context_str="short")
+    again = generator.generate_response("What is ML?", sample_context)
+
+    assert custom["prompt_length"] != default["prompt_length"]
+    assert again == default
+
+    cited = generator.generate_with_citations("What is ML?", sample_context, context_str="short")
+    generator.generate_with_citations("What is ML?", sample_context)
+    assert cited["status"] == "success"
+    assert generator.cache_stats()["hits"] == 1
+
+
+def test_response_cache_isolates_citations(generator, sample_context):
+    """Test that mutating a returned citation list does not corrupt the cache."""
+    first = generator.generate_with_citations("What is ML?", sample_context)
+    expected = [dict(c) for c in first["citations"]]
+    first["citations"][0]["source"] = "mutated"
+    first["citations"].append({"index": 99})
+
+    second = generator.generate_with_citations("What is ML?", sample_context)
+    assert second["citations"] == expected
+    second["citations"].clear()
+
+    third = generator.generate_with_citations("What is ML?", sample_context)
+    assert third["citations"] == expected
+    assert generator.cache_stats()["hits"] == 2
+
+
+def test_response_cache_respects_template_changes(generator, sample_context):
+    """Test that redefining a template does not serve stale responses."""
+    generator.set_prompt_template("custom", "Q: {query}\n{context}")
+    first = generator.generate_response("What is ML?", sample_context, template="custom")
+    generator.set_prompt_template("custom", "{context}\n\nQuestion: {query}\nA:")
+    second = generator.generate_response("What is ML?", sample_context, template="custom")
+
+    assert first["prompt_length"] != second["prompt_length"]
+
+
+def test_response_cache_expires(sample_context):
+    """Test that cached responses expire after the TTL."""
+    generator = GeneratorManager(response_cache_ttl=0)
+    generator.generate_response("What is ML?", sample_context)
+    generator.generate_response("What is ML?", sample_context)
+
+    assert generator.cache_stats()["hits"] == 0
+
+
+def test_semantic_cache_matches_paraphrase(sample_context):
+    """Test that near-duplicate queries reuse a cached response."""
+    pytest.importorskip("numpy")
+    from src.server import SemanticCache
+
+    vectors = {
+        "What is ML?": [1.0, 0.0, 0.1],
+        "Explain ML": [1.0, 0.05, 0.1],
+        "Who wrote this?": [0.0, 1.0, 0.0],
+    }
+    generator = GeneratorManager(
+        semantic_cache=SemanticCache(vectors.__getitem__, threshold=0.95)
+    )
+
+    first = generator.generate_response("What is ML?", sample_context)
+    paraphrase = generator.generate_response("Explain ML", sample_context)
+    unrelated = generator.generate_response("Who wrote this?", sample_context)
+    other_context = generator.generate_response("Explain ML", sample_context[:1])
+
+    assert paraphrase["response"] == first["response"]
+    assert paraphrase["query"] == "Explain ML"
+    assert "semantic_similarity" in paraphrase
+    assert "semantic_similarity" not in unrelated
+    assert "semantic_similarity" not in other_context
+
+
+def test_extract_info_returns_independent_results(generator, sample_context):
+    """Test that repeated extractions with one schema return independent results."""
+    schema = {
+        "properties": {
+            "topic": {"type": "string"},
+            "tags": {"type": "array"},
+            "score": {"type": "number"},
+            "ignored": {"type": "object"}
+        }
+    }
+
+    first = generator.extract_info(sample_context, dict(schema))
+    first["extracted"]["tags"].append("mutated")
+    second = generator.extract_info(sample_context, dict(schema))
+
+    assert second["extracted"] == {
+        "topic": "Extracted topic from documents",
+        "tags": [],
+        "score": 0
+    }
+
+
+def test_custom_template_does_not_leak_between_instances(generator):
+    """Test that templates set on one manager leave the shared defaults alone."""
+    generator.set_prompt_template("default", "Only {query}: {context}")
+
+    assert GeneratorManager().templates["default"] == GeneratorManager.DEFAULT_TEMPLATES["default"]
+    assert generator.templates["default"] == "Only {query}: {context}"
+
+
+def test_disk_response_cache_survives_restart(tmp_path, sample_context):
+    """Test that generated responses are reloaded from the on-disk cache."""
+    first = GeneratorManager(cache_dir=str(tmp_path))
+    original = first.generate_with_citations("What is ML?", sample_context)
+    first.disk_cache.close()
+
+    second = GeneratorManager(cache_dir=str(tmp_path))
+    result = second.generate_with_citations("What is ML?", sample_context)
+
+    assert result == original
+    assert second.cache_stats()["hits"] == 1
+
+
+def test_disk_response_cache_purges_expired_rows(tmp_path, sample_context):
+    """Test that expired responses are deleted from the cache file."""
+    generator = GeneratorManager(response_cache_ttl=0, cache_dir=str(tmp_path))
+    for i in range(5):
+        generator.generate_response(f"Question {i}?", sample_context)
+
+    with sqlite3.connect(generator.disk_cache.path) as conn:
+        (rows,) = conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+    generator.disk_cache.close()
+
+    assert rows == 1
+
+
+def test_concurrent_identical_requests_generate_once(generator, sample_context):
+    """Test that a stampede of identical requests runs generation only once."""
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+    barrier = threading.Barrier(8)
+    original = generator._mock_generate
+
+    def blocking_generate(prompt):
+        calls.append(prompt)
+        started.set()
+        assert release.wait(timeout=5)
+        return original(prompt)
+
+    def request():
+        barrier.wait(timeout=5)
+        return generator.generate_response("What is ML?", sample_context)
+
+    generator._mock_generate = blocking_generate
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(request) for _ in range(8)]
+        assert started.wait(timeout=5)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(r == results[0] for r in results)
@@ -4,9 +4,13 @@ MCP Reranker Server
 Result reranking for improved retrieval quality.
 """
 
+import asyncio
 import json
 import logging
-from typing import Any, Optional, List, Dict
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, FrozenSet, Optional, List, Dict, Tuple
 
 try:
     from mcp.server import Server
@@ -18,53 +22,130 @@ except ImportError:
 
 import numpy as np
 
+from .utils import doc_key, mmr_select, top_k_indices
+
+try:
+    import orjson
+
+    def _json_dumps(obj: Any, pretty: bool = False) -> str:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(obj, option=option).decode("utf-8")
+except ImportError:
+    orjson = None
+
+    def _json_dumps(obj: Any, pretty: bool = False) -> str:
+        if pretty:
+            return json.dumps(obj, indent=2)
+        return json.dumps(obj, separators=(",", ":"))
+
+# Indent tool output for debugging; compact JSON is the wire default
+PRETTY_JSON = os.getenv("RERANKER_PRETTY_JSON", "").lower() in ("1", "true", "yes")
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_rng = np.random.default_rng()
+
 
 class RerankerManager:
     """Manages reranking operations."""
+
+    # Budget for the token LRU, counted as characters of text held (each
+    # entry keeps the original text as key plus its lowercased copy)
+    TOKEN_CACHE_MAX_CHARS = 8_000_000
     
     def __init__(self):
         self.cross_encoder = None
+        # text -> (lowercased text, token set), shared across tool calls
+        self._token_cache: "OrderedDict[str, Tuple[str, FrozenSet[str]]]" = OrderedDict()
+        self._token_cache_chars = 0
+        self._token_cache_lock = threading.Lock()
+
+    def _tokenize(self, texts: List[str]) -> List[Tuple[str, FrozenSet[str]]]:
+        """Lowercased text and token set for each text, memoized in an LRU.
+
+        The lock covers only the lookups and inserts; lowercasing and
+        splitting run outside it so concurrent calls tokenize in parallel.
+        """
+        cache = self._token_cache
+        with self._token_cache_lock:
+            prepared = [cache.get(text) for text in texts]
+            for text, entry in zip(texts, prepared):
+                if entry is not None:
+                    cache.move_to_end(text)
+
+        computed: Dict[str, Tuple[str, FrozenSet[str]]] = {}
+        for i, entry in enumerate(prepared):
+            if entry is None:
+                text = texts[i]
+                entry = computed.get(text)
+                if entry is None:
+                    text_lower = text.lower()
+                    entry = computed[text] = (text_lower, frozenset(text_lower.split()))
+                prepared[i] = entry
+
+        if computed:
+            with self._token_cache_lock:
+                for text, entry in computed.items():
+                    size = 2 * len(text)
+                    if size > self.TOKEN_CACHE_MAX_CHARS:
+                        continue
+                    if cache.pop(text, None) is not None:
+                        self._token_cache_chars -= size
+                    cache[text] = entry
+                    self._token_cache_chars += size
+                while self._token_cache_chars > self.TOKEN_CACHE_MAX_CHARS:
+                    evicted, _ = cache.popitem(last=False)
+                    self._token_cache_chars -= 2 * len(evicted)
+        return prepared
         
     def _compute_relevance(self, query: str, doc: str) -> float:
         """Simple relevance scoring for demo."""
-        query_words = set(query.lower().split())
-        doc_words = set(doc.lower().split())
-        
+        return float(self._compute_relevance_batch(query, [doc])[0])
+
+    def _compute_relevance_batch(self, query: str, docs: List[str]) -> np.ndarray:
+        """Score many documents against one query as a bag-of-words overlap.
+
+        Overlap counts come from C-level frozenset intersections against the
+        cached per-document token sets; the phrase bonus, coverage and
+        clipping are array operations.
+        """
+        num_docs = len(docs)
+        query_lower = query.lower()
+        query_words = frozenset(query_lower.split())
         if not query_words:
-            return 0.0
-        
-        overlap = len(query_words & doc_words)
+            return np.zeros(num_docs)
+
+        prepared = self._tokenize(docs)
+        overlap = np.fromiter(
+            (len(query_words & doc_tokens) for _, doc_tokens in prepared),
+            dtype=np.float64, count=num_docs
+        )
+
         coverage = overlap / len(query_words)
-        
         # Bonus for exact phrase match
-        if query.lower() in doc.lower():
-            coverage += 0.2
-        
-        return min(coverage, 1.0)
+        phrase = np.fromiter(
+            (query_lower in doc_lower for doc_lower, _ in prepared), dtype=bool, count=num_docs
+        )
+        return np.minimum(coverage + 0.2 * phrase, 1.0)
     
     def rerank(self, query: str, documents: List[Dict], 
               top_k: Optional[int] = None) -> dict:
         """Rerank results using cross-encoder scoring."""
-        scored_docs = []
-        
-        for doc in documents:
-            text = doc.get("text", doc.get("content", ""))
-            score = self._compute_relevance(query, text)
-            scored_docs.append({
-                **doc,
-                "rerank_score": score,
-                "original_score": doc.get("score", 0)
-            })
-        
-        # Sort by rerank score
-        scored_docs.sort(key=lambda x: x["rerank_score"], reverse=True)
-        
-        if top_k:
-            scored_docs = scored_docs[:top_k]
-        
+        texts = [doc.get("text", doc.get("content", "")) for doc in documents]
+        scores = self._compute_relevance_batch(query, texts)
+
+        # Select by rerank score; only the kept documents are copied
+        order = top_k_indices(scores, top_k or None)
+        scored_docs = [
+            {
+                **documents[i],
+                "rerank_score": float(scores[i]),
+                "original_score": documents[i].get("score", 0)
+            }
+            for i in order.tolist()
+        ]
+
         return {
             "status": "success",
             "query": query,
@@ -74,26 +155,25 @@ class RerankerManager:
         }
     
     def llm_rerank(self, query: str, documents: List[Dict],
-                  model: str = "mock") -> dict:
+                  model: str = "mock", top_k: Optional[int] = None) -> dict:
         """Rerank using LLM relevance scoring."""
         # Mock LLM scoring
-        scored_docs = []
-        
-        for doc in documents:
-            text = doc.get("text", doc.get("content", ""))
-            # Simulate LLM scoring with relevance computation
-            base_score = self._compute_relevance(query, text)
-            # Add some variance to simulate LLM
-            llm_score = base_score + np.random.uniform(-0.1, 0.1)
-            llm_score = max(0, min(1, llm_score))
-            
-            scored_docs.append({
-                **doc,
-                "llm_score": llm_score,
-                "original_score": doc.get("score", 0)
-            })
-        
-        scored_docs.sort(key=lambda x: x["llm_score"], reverse=True)
+        texts = [doc.get("text", doc.get("content", "")) for doc in documents]
+        # Simulate LLM scoring with relevance computation
+        base_scores = self._compute_relevance_batch(query, texts)
+        # Add some variance to simulate LLM
+        noise = _rng.uniform(-0.1, 0.1, size=base_scores.size)
+        llm_scores = np.clip(base_scores + noise, 0.0, 1.0)
+
+        # Only the kept documents are copied
+        scored_docs = [
+            {
+                **documents[i],
+                "llm_score": float(llm_scores[i]),
+                "original_score": documents[i].get("score", 0)
+            }
+            for i in top_k_indices(llm_scores, top_k or None).tolist()
+        ]
         
         return {
             "status": "success",
@@ -106,35 +186,37 @@ class RerankerManager:
     
     def fuse_rankings(self, rankings: List[List[Dict]], k: int = 60) -> dict:
         """Combine multiple rankings using Reciprocal Rank Fusion."""
-        doc_scores = {}
+        # Map each distinct document to a dense slot, keeping its first copy
+        slots = {}
+        docs = []
+        doc_slots = []
+        ranks = []
         
         for ranking in rankings:
             for rank, doc in enumerate(ranking):
-                doc_id = doc.get("id", str(hash(doc.get("text", ""))))
-                
-                # RRF formula: 1 / (k + rank)
-                rrf_score = 1.0 / (k + rank + 1)
-                
-                if doc_id not in doc_scores:
-                    doc_scores[doc_id] = {
-                        "doc": doc,
-                        "rrf_score": 0,
-                        "appearances": 0
-                    }
-                
-                doc_scores[doc_id]["rrf_score"] += rrf_score
-                doc_scores[doc_id]["appearances"] += 1
+                slot = slots.setdefault(doc_key(doc), len(slots))
+                if slot == len(docs):
+                    docs.append(doc)
+                doc_slots.append(slot)
+                ranks.append(rank)
+        
+        # RRF formula: 1 / (k + rank), accumulated per document in one pass
+        doc_slots = np.array(doc_slots, dtype=np.intp)
+        rrf_scores = np.bincount(
+            doc_slots, weights=1.0 / (k + np.array(ranks, dtype=np.float64) + 1),
+            minlength=len(docs)
+        )
+        appearances = np.bincount(doc_slots, minlength=len(docs))
         
         # Sort by RRF score
         fused_results = [
             {
-                **item["doc"],
-                "rrf_score": item["rrf_score"],
-                "appearances": item["appearances"]
+                **docs[i],
+                "rrf_score": float(rrf_scores[i]),
+                "appearances": int(appearances[i])
             }
-            for item in doc_scores.values()
+            for i in top_k_indices(rrf_scores).tolist()
         ]
-        fused_results.sort(key=lambda x: x["rrf_score"], reverse=True)
         
         return {
             "status": "success",
@@ -151,40 +233,18 @@ class RerankerManager:
         if not documents:
             return {"status": "success", "results": [], "count": 0}
         
-        selected = [documents[0]]
-        remaining = documents[1:]
-        
-        while len(selected) < top_k and remaining:
-            best_doc = None
-            best_score = -float('inf')
-            
-            for doc in remaining:
-                doc_text = doc.get("text", "")
-                relevance = doc.get("score", doc.get("rerank_score", 0.5))
-                
-                # Calculate max similarity to selected docs
-                max_sim = 0
-                for sel_doc in selected:
-                    sel_text = sel_doc.get("text", "")
-                    # Simple word overlap similarity
-                    doc_words = set(doc_text.lower().split())
-                    sel_words = set(sel_text.lower().split())
-                    if doc_words and sel_words:
-                        sim = len(doc_words & sel_words) / len(doc_words | sel_words)
-                        max_sim = max(max_sim, sim)
-                
-                # MMR score
-                mmr_score = lambda_param * relevance - (1 - lambda_param) * max_sim
-                
-                if mmr_score > best_score:
-                    best_score = mmr_score
-                    best_doc = doc
-            
-            if best_doc:
-                selected.append({**best_doc, "diversity_score": best_score})
-                remaining.remove(best_doc)
-            else:
-                break
+        tokens = [
+            doc_tokens for _, doc_tokens in self._tokenize([doc.get("text", "") for doc in documents])
+        ]
+        relevance = np.array(
+            [doc.get("score", doc.get("rerank_score", 0.5)) for doc in documents],
+            dtype=np.float64
+        )
+        picks, scores = mmr_select(tokens, relevance, lambda_param, top_k)
+        selected = [documents[0]] + [
+            {**documents[i], "diversity_score": score}
+            for i, score in zip(picks, scores)
+        ]
         
         return {
             "status": "success",
@@ -221,7 +281,8 @@ TOOLS = [
             "properties": {
                 "query": {"type": "string"},
                 "documents": {"type": "array", "items": {"type": "object"}},
-                "model": {"type": "string"}
+                "model": {"type": "string"},
+                "top_k": {"type": "integer"}
             },
             "required": ["query", "documents"]
         }
@@ -261,21 +322,22 @@ if app:
     @app.call_tool()
     async def call_tool(name: str, arguments: dict) -> list[TextContent]:
         try:
+            # Scoring is CPU-bound; run it off the event loop
             if name == "rerank":
-                result = manager.rerank(**arguments)
+                result = await asyncio.to_thread(manager.rerank, **arguments)
             elif name == "llm_rerank":
-                result = manager.llm_rerank(**arguments)
+                result = await asyncio.to_thread(manager.llm_rerank, **arguments)
             elif name == "fuse_rankings":
-                result = manager.fuse_rankings(**arguments)
+                result = await asyncio.to_thread(manager.fuse_rankings, **arguments)
             elif name == "diversify":
-                result = manager.diversify(**arguments)
+                result = await asyncio.to_thread(manager.diversify, **arguments)
             else:
                 result = {"error": f"Unknown tool: {name}"}
             
-            return [TextContent(type="text", text=json.dumps(result, indent=2))]
+            return [TextContent(type="text", text=_json_dumps(result, pretty=PRETTY_JSON))]
         except Exception as e:
             logger.error(f"Error in {name}: {e}")
-            return [TextContent(type="text", text=json.dumps({"error": str(e)}))]
+            return [TextContent(type="text", text=_json_dumps({"error": str(e)}))]
 
 
 async def main():
@@ -285,5 +347,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
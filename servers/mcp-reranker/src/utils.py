@@ -2,11 +2,53 @@
 Utility functions for MCP Reranker Server.
 """
 
+import hashlib
 import logging
-from typing import List, Dict, Any, Tuple
+from typing import AbstractSet, List, Dict, Any, FrozenSet, Hashable, Optional, Tuple
+
+import numpy as np
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 logger = logging.getLogger(__name__)
 
+# Candidate pools at least this large use the compiled MMR loop when numba is installed
+MMR_JIT_MIN_DOCS = 100
+
+
+def text_id(text: str) -> int:
+    """Stable 64-bit integer id for a document's text.
+
+    Uses xxh3-64 when xxhash is installed and an 8-byte BLAKE2b digest
+    otherwise. Unlike the builtin ``hash()``, the id is the same in every
+    process.
+
+    Args:
+        text: Document text
+
+    Returns:
+        Unsigned 64-bit integer
+    """
+    data = text.encode('utf-8')
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def doc_key(doc: Dict[str, Any]) -> Hashable:
+    """Identity of a document for fusion: its ``id``, else a hash of its text."""
+    if "id" in doc:
+        return doc["id"]
+    return text_id(doc.get("text", ""))
+
 
 def normalize_scores(scores: List[float]) -> List[float]:
     """Normalize scores to 0-1 range.
@@ -20,14 +62,41 @@ def normalize_scores(scores: List[float]) -> List[float]:
     if not scores:
         return scores
 
-    min_score = min(scores)
-    max_score = max(scores)
-    score_range = max_score - min_score
+    values = np.asarray(scores, dtype=np.float64)
+    min_score = values.min()
+    score_range = values.max() - min_score
 
     if score_range == 0:
         return [0.5] * len(scores)
 
-    return [(s - min_score) / score_range for s in scores]
+    return ((values - min_score) / score_range).tolist()
+
+
+def top_k_indices(scores: np.ndarray, top_k: Optional[int] = None) -> np.ndarray:
+    """Return indices of the highest scores in descending order.
+
+    Uses ``np.partition`` to find the k-th largest score in linear time and
+    only sorts the selected tail. Ties keep their original order, exactly as
+    a stable descending sort followed by ``[:top_k]`` would.
+
+    Args:
+        scores: 1-D array of scores
+        top_k: Number of indices to return (None for all)
+
+    Returns:
+        Array of indices into ``scores``
+    """
+    scores = np.asarray(scores)
+    if top_k is None or top_k >= scores.size:
+        return np.argsort(-scores, kind="stable")
+    if top_k <= 0:
+        return np.empty(0, dtype=np.intp)
+
+    kth = np.partition(scores, scores.size - top_k)[scores.size - top_k]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:top_k - above.size]
+    selected = np.concatenate((above, ties))
+    return selected[np.argsort(-scores[selected], kind="stable")]
 
 
 def compute_reciprocal_rank_score(rank: int, k: int = 60) -> float:
@@ -56,18 +125,198 @@ def calculate_diversity_score(doc_text: str, selected_texts: List[str]) -> float
     if not selected_texts:
         return 0.0
 
-    doc_words = set(doc_text.lower().split())
+    return _max_jaccard(token_set(doc_text), [token_set(text) for text in selected_texts])
+
+
+def token_set(text: str) -> FrozenSet[str]:
+    """Lowercased whitespace tokens of a text.
+
+    Not memoized: callers tokenize each text once per call, and a cache
+    keyed on whole document texts would pin unbounded amounts of memory.
 
+    Args:
+        text: Document text
+
+    Returns:
+        Frozen set of tokens
+    """
+    return frozenset(text.lower().split())
+
+
+def _max_jaccard(doc_words: AbstractSet[str], selected_words: List[AbstractSet[str]]) -> float:
+    """Largest Jaccard similarity between one token set and several others."""
     max_similarity = 0.0
-    for sel_text in selected_texts:
-        sel_words = set(sel_text.lower().split())
-        if doc_words and sel_words:
+    if not doc_words:
+        return max_similarity
+    for sel_words in selected_words:
+        if sel_words:
             similarity = len(doc_words & sel_words) / len(doc_words | sel_words)
             max_similarity = max(max_similarity, similarity)
 
     return max_similarity
 
 
+class JaccardIndex:
+    """Inverted index over token sets for one-vs-all Jaccard similarity.
+
+    Each document's terms are mapped to integer ids once; ``similarities(j)``
+    then gathers the postings of document ``j``'s terms and counts shared
+    terms for every document with a single ``bincount``.
+    """
+
+    def __init__(self, token_sets: List[AbstractSet[str]]):
+        vocab: Dict[str, int] = {}
+        self._doc_terms = [
+            np.fromiter((vocab.setdefault(t, len(vocab)) for t in toks),
+                        dtype=np.intp, count=len(toks))
+            for toks in token_sets
+        ]
+        self.sizes = np.fromiter(map(len, token_sets), dtype=np.float64, count=len(token_sets))
+
+        term_ids = np.concatenate(self._doc_terms) if self._doc_terms else np.empty(0, np.intp)
+        doc_ids = np.repeat(np.arange(len(token_sets)), self.sizes.astype(np.intp))
+        order = np.argsort(term_ids, kind="stable")
+        self._postings = doc_ids[order]
+        self._starts = np.searchsorted(term_ids[order], np.arange(len(vocab) + 1))
+
+    def similarities(self, j: int) -> np.ndarray:
+        """Jaccard similarity of every document to document ``j``."""
+        terms = self._doc_terms[j]
+        shared = np.zeros(self.sizes.size)
+        if terms.size:
+            hits = np.concatenate([
+                self._postings[start:end]
+                for start, end in zip(self._starts[terms], self._starts[terms + 1])
+            ])
+            shared = np.bincount(hits, minlength=self.sizes.size).astype(np.float64)
+        union = self.sizes + self.sizes[j] - shared
+        return np.divide(shared, union, out=np.zeros_like(shared), where=union > 0)
+
+    def csr(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-document sorted term ids as ``(offsets, terms)`` arrays."""
+        offsets = np.zeros(len(self._doc_terms) + 1, dtype=np.int64)
+        np.cumsum(self.sizes.astype(np.int64), out=offsets[1:])
+        terms = [np.sort(t) for t in self._doc_terms]
+        return offsets, (np.concatenate(terms) if terms else np.empty(0, np.intp)).astype(np.int64)
+
+
+def _mmr_select_loop(offsets, terms, relevance, lambda_param, top_k, reward_diversity):
+    """Scalar MMR loop over CSR term ids, written for ``numba.njit``.
+
+    Each step merges the last pick's sorted terms with every candidate's to
+    update a running max Jaccard similarity, then takes the best MMR score.
+    """
+    n = relevance.shape[0]
+    limit = max(min(top_k, n) - 1, 0)
+    picks = np.empty(limit, dtype=np.int64)
+    scores = np.empty(limit, dtype=np.float64)
+    max_sim = np.zeros(n)
+    available = np.ones(n, dtype=np.bool_)
+    available[0] = False
+    last = 0
+    count = 0
+
+    for _ in range(limit):
+        a_start, a_end = offsets[last], offsets[last + 1]
+        best = -1
+        best_score = -np.inf
+        for i in range(n):
+            if not available[i]:
+                continue
+            b_start, b_end = offsets[i], offsets[i + 1]
+            if a_end > a_start and b_end > b_start:
+                shared = 0
+                p, q = a_start, b_start
+                while p < a_end and q < b_end:
+                    if terms[p] == terms[q]:
+                        shared += 1
+                        p += 1
+                        q += 1
+                    elif terms[p] < terms[q]:
+                        p += 1
+                    else:
+                        q += 1
+                sim = shared / ((a_end - a_start) + (b_end - b_start) - shared)
+                if sim > max_sim[i]:
+                    max_sim[i] = sim
+            if reward_diversity:
+                score = lambda_param * relevance[i] + (1 - lambda_param) * (1.0 - max_sim[i])
+            else:
+                score = lambda_param * relevance[i] - (1 - lambda_param) * max_sim[i]
+            if score > best_score:
+                best_score = score
+                best = i
+        if best < 0:
+            break
+        picks[count] = best
+        scores[count] = best_score
+        count += 1
+        available[best] = False
+        last = best
+
+    return picks[:count], scores[:count]
+
+
+_mmr_select_jit = njit(cache=True)(_mmr_select_loop) if njit is not None else None
+
+
+def mmr_select(token_sets: List[AbstractSet[str]], relevance: np.ndarray, lambda_param: float,
+               top_k: int, reward_diversity: bool = False) -> Tuple[List[int], List[float]]:
+    """Greedy MMR selection seeded with document 0.
+
+    Scores are ``lambda * rel - (1 - lambda) * max_sim``, or with
+    ``reward_diversity`` the equivalent ``lambda * rel + (1 - lambda) * (1 - max_sim)``.
+
+    Args:
+        token_sets: Token set per candidate document
+        relevance: Relevance score per document
+        lambda_param: Trade-off between relevance and diversity (0-1)
+        top_k: Total number of documents to select, including the seed
+        reward_diversity: Score with the diversity form instead of the penalty form
+
+    Returns:
+        Indices picked after the seed and their MMR scores
+    """
+    if top_k <= 1 or relevance.size <= 1:
+        return [], []
+    if lambda_param == 1:
+        # No diversity weight: MMR is a stable sort by relevance
+        picks = top_k_indices(relevance[1:], top_k - 1) + 1
+        return picks.tolist(), relevance[picks].tolist()
+
+    index = JaccardIndex(token_sets)
+    if _mmr_select_jit is not None and relevance.size >= MMR_JIT_MIN_DOCS:
+        offsets, terms = index.csr()
+        picks, scores = _mmr_select_jit(offsets, terms, relevance, float(lambda_param),
+                                        int(top_k), reward_diversity)
+        return picks.tolist(), scores.tolist()
+
+    picks: List[int] = []
+    scores: List[float] = []
+    # Running max similarity of every document to the selected set
+    max_sim = index.similarities(0)
+    available = np.ones(relevance.size, dtype=bool)
+    available[0] = False
+
+    while len(picks) + 1 < top_k and available.any():
+        candidates = np.flatnonzero(available)
+        if reward_diversity:
+            diversity = 1.0 - max_sim[candidates]
+            mmr_scores = lambda_param * relevance[candidates] + (1 - lambda_param) * diversity
+        else:
+            mmr_scores = (lambda_param * relevance[candidates]
+                          - (1 - lambda_param) * max_sim[candidates])
+
+        best = int(np.argmax(mmr_scores))
+        doc_idx = int(candidates[best])
+        available[doc_idx] = False
+        picks.append(doc_idx)
+        scores.append(float(mmr_scores[best]))
+        np.maximum(max_sim, index.similarities(doc_idx), out=max_sim)
+
+    return picks, scores
+
+
 def merge_rankings(rankings: List[List[Dict[str, Any]]], method: str = "rrf", k: int = 60) -> List[Dict[str, Any]]:
     """Merge multiple rankings into a single ranking.
 
@@ -83,7 +332,7 @@ def merge_rankings(rankings: List[List[Dict[str, Any]]], method: str = "rrf", k:
 
     for ranking in rankings:
         for rank, doc in enumerate(ranking):
-            doc_id = doc.get("id", str(hash(doc.get("text", ""))))
+            doc_id = doc_key(doc)
 
             if method == "rrf":
                 score = compute_reciprocal_rank_score(rank, k)
@@ -126,25 +375,9 @@ def apply_mmr_selection(documents: List[Dict[str, Any]], lambda_param: float = 0
     if not documents or top_k <= 0:
         return []
 
-    selected = [documents[0]]
-    remaining = documents[1:]
-
-    while len(selected) < top_k and remaining:
-        best_score = -float('inf')
-        best_idx = 0
-
-        for idx, doc in enumerate(remaining):
-            relevance = doc.get("score", doc.get("rerank_score", 0.5))
-            doc_text = doc.get("text", "")
-
-            diversity = 1.0 - calculate_diversity_score(doc_text, [d.get("text", "") for d in selected])
-
-            mmr_score = lambda_param * relevance + (1 - lambda_param) * diversity
-
-            if mmr_score > best_score:
-                best_score = mmr_score
-                best_idx = idx
-
-        selected.append(remaining.pop(best_idx))
+    tokens = [token_set(doc.get("text", "")) for doc in documents]
+    relevance = np.array([doc.get("score", doc.get("rerank_score", 0.5)) for doc in documents],
+                         dtype=np.float64)
+    picks, _ = mmr_select(tokens, relevance, lambda_param, top_k, reward_diversity=True)
 
-    return selected
+    return [documents[0]] + [documents[i] for i in picks]
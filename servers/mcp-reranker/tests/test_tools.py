@@ -2,6 +2,8 @@
 Tests for Reranker tools.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 from src.server import RerankerManager
 
@@ -49,6 +51,15 @@ def test_llm_rerank(reranker, sample_documents):
     assert all("llm_score" in doc for doc in result["results"])
 
 
+def test_llm_rerank_top_k(reranker, sample_documents):
+    """Test that LLM reranking returns only the best top_k documents."""
+    result = reranker.llm_rerank("machine learning", sample_documents, top_k=2)
+
+    scores = [doc["llm_score"] for doc in result["results"]]
+    assert result["count"] == 2
+    assert scores == sorted(scores, reverse=True)
+
+
 def test_fuse_rankings(reranker, sample_documents):
     """Test reciprocal rank fusion."""
     rankings = [
@@ -142,3 +153,122 @@ def test_rerank_preserves_metadata(reranker):
     result = reranker.rerank(query="test", documents=docs)
 
     assert all("metadata" in doc for doc in result["results"])
+
+
+def test_batch_relevance_matches_single(reranker, sample_documents):
+    """Test that batch scoring agrees with per-document scoring."""
+    query = "neural networks learn"
+    texts = [doc["text"] for doc in sample_documents]
+
+    batch = reranker._compute_relevance_batch(query, texts)
+
+    assert batch.tolist() == [reranker._compute_relevance(query, text) for text in texts]
+    assert reranker._compute_relevance_batch("", texts).tolist() == [0.0] * len(texts)
+
+
+def test_rerank_top_k_matches_full_sort(reranker, sample_documents):
+    """Test that partial top-k selection matches a full sort."""
+    full = reranker.rerank("neural networks learning", sample_documents)
+    top = reranker.rerank("neural networks learning", sample_documents, top_k=2)
+
+    assert [d["id"] for d in top["results"]] == [d["id"] for d in full["results"][:2]]
+
+
+def test_fuse_rankings_merges_documents_without_ids(reranker):
+    """Test that id-less documents are matched across rankings by text."""
+    rankings = [
+        [{"text": "alpha"}, {"text": "beta"}],
+        [{"text": "beta"}, {"text": "alpha"}],
+    ]
+
+    result = reranker.fuse_rankings(rankings)
+
+    assert result["count"] == 2
+    assert all(doc["appearances"] == 2 for doc in result["results"])
+
+
+def test_diversify_large_pool(reranker):
+    """Test MMR selection over a pool at the size that uses numba when installed."""
+    docs = [
+        {"id": str(i), "text": f"topic{i % 7} shared words item{i}", "score": 1.0 - i / 200}
+        for i in range(150)
+    ]
+
+    result = reranker.diversify(docs, lambda_param=0.5, top_k=10)
+
+    ids = [doc["id"] for doc in result["results"]]
+    assert len(ids) == 10 == len(set(ids))
+    assert ids[0] == "0"
+    assert all("diversity_score" in doc for doc in result["results"][1:])
+
+
+@pytest.mark.parametrize("reward_diversity", [False, True])
+def test_mmr_select_loop_matches_numpy_path(reward_diversity):
+    """Test the loop numba compiles, run as plain Python, against mmr_select."""
+    import numpy as np
+    from src.utils import JaccardIndex, _mmr_select_loop, mmr_select
+
+    rng = np.random.default_rng(7)
+    vocab = [f"w{i}" for i in range(30)]
+    token_sets = [frozenset(rng.choice(vocab, size=rng.integers(0, 8))) for _ in range(40)]
+    relevance = rng.random(len(token_sets))
+
+    # Below MMR_JIT_MIN_DOCS, so mmr_select takes the NumPy path
+    expected_picks, expected_scores = mmr_select(
+        token_sets, relevance, 0.6, 12, reward_diversity=reward_diversity
+    )
+    offsets, terms = JaccardIndex(token_sets).csr()
+    picks, scores = _mmr_select_loop(offsets, terms, relevance, 0.6, 12, reward_diversity)
+
+    assert picks.tolist() == expected_picks
+    assert scores.tolist() == pytest.approx(expected_scores)
+
+
+def test_token_cache_reused_across_calls(reranker, sample_documents):
+    """Test that documents are tokenized once across repeated reranks."""
+    reranker.rerank("neural networks", sample_documents)
+    cached = dict(reranker._token_cache)
+    reranker.rerank("training data", sample_documents)
+
+    assert len(reranker._token_cache) == len(sample_documents)
+    for text, entry in cached.items():
+        assert reranker._token_cache[text] is entry
+
+
+def test_rerank_handles_very_long_token(reranker):
+    """Test that one huge unbroken token does not blow up scoring memory."""
+    docs = [{"id": str(i), "text": " ".join(["neural network words"] * 160)} for i in range(40)]
+    docs.append({"id": "blob", "text": "neural " + "x" * 100_000})
+
+    result = reranker.rerank("neural networks", docs, top_k=5)
+
+    assert result["count"] == 5
+    assert all(0 <= doc["rerank_score"] <= 1 for doc in result["results"])
+
+
+def test_token_cache_bounded_by_characters(reranker):
+    """Test that the token cache evicts by total characters held."""
+    reranker.TOKEN_CACHE_MAX_CHARS = 200
+    texts = [f"document number {i} " * 3 for i in range(20)]
+
+    prepared = reranker._tokenize(texts)
+
+    assert [tokens for _, tokens in prepared] == [frozenset(t.lower().split()) for t in texts]
+    assert reranker._token_cache_chars <= 200
+    assert reranker._token_cache_chars == sum(2 * len(t) for t in reranker._token_cache)
+    assert texts[-1] in reranker._token_cache
+
+
+def test_concurrent_reranks_share_token_cache(reranker, sample_documents):
+    """Test that reranks running on worker threads agree with a serial run."""
+    queries = ["neural networks", "training data", "deep learning layers", "model accuracy"] * 4
+    expected = [reranker.rerank(q, sample_documents)["results"] for q in queries]
+    reranker._token_cache.clear()
+    reranker._token_cache_chars = 0
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda q: reranker.rerank(q, sample_documents)["results"], queries))
+
+    assert results == expected
+    assert len(reranker._token_cache) == len(sample_documents)
+    assert reranker._token_cache_chars == sum(2 * len(t) for t in reranker._token_cache)
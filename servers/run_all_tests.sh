@@ -7,6 +7,7 @@
 #   -v, --verbose    Verbose output
 #   -c, --coverage   Generate coverage reports
 #   -f, --fast       Skip slow tests
+#   -p, --parallel   Run tests in parallel (requires pytest-xdist)
 #   -h, --help       Show this help message
 
 set -e
@@ -22,6 +23,7 @@ NC='\033[0m' # No Color
 VERBOSE=""
 COVERAGE=""
 MARKERS=""
+PARALLEL=""
 
 # Parse arguments
 while [[ $# -gt 0 ]]; do
@@ -38,6 +40,10 @@ while [[ $# -gt 0 ]]; do
             MARKERS='-m "not slow"'
             shift
             ;;
+        -p|--parallel)
+            PARALLEL="-n auto"
+            shift
+            ;;
         -h|--help)
             echo "Usage: $0 [options]"
             echo ""
@@ -45,6 +51,7 @@ while [[ $# -gt 0 ]]; do
             echo "  -v, --verbose    Verbose output"
             echo "  -c, --coverage   Generate coverage reports"
             echo "  -f, --fast       Skip slow tests"
+            echo "  -p, --parallel   Run tests in parallel (requires pytest-xdist)"
             echo "  -h, --help       Show this help message"
             exit 0
             ;;
@@ -84,7 +91,7 @@ for server in "${SERVERS[@]}"; do
         cd "$server"
 
         # Run pytest
-        if eval "pytest tests/ $VERBOSE $COVERAGE $MARKERS"; then
+        if eval "pytest tests/ $VERBOSE $COVERAGE $MARKERS $PARALLEL"; then
             echo -e "${GREEN}✓ ${server} tests passed${NC}"
             PASSED_SERVERS+=("$server")
         else